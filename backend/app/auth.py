@@ -1,13 +1,22 @@
+import asyncio
+import secrets
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, List, Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import HTTPException, status, Depends
+from fastapi import HTTPException, Header, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 from . import models
-from .database import get_db
+from .cache import TTLCache
+from .database import get_async_db
 import os
 from dotenv import load_dotenv
 
@@ -16,13 +25,82 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+TICKET_TTL = 60
+PASSWORD_REHASH = os.getenv("PASSWORD_REHASH", "false").lower() in ("1", "true", "yes")
+# Cost of new hashes; with PASSWORD_REHASH, logins upgrade hashes below BCRYPT_MIN_ROUNDS.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+BCRYPT_MIN_ROUNDS = int(os.getenv("BCRYPT_MIN_ROUNDS", str(BCRYPT_ROUNDS)))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+class PasswordPool:
+    """Bounded thread pool for bcrypt work.
+
+    bcrypt releases the GIL while hashing, so a few threads give real
+    parallelism and keep the event loop free during logins.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = max(1, workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+
+    def submit(self, fn, *args) -> Future:
+        with self._lock:
+            self._in_flight += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, _future: Future):
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+
+    async def run(self, fn, *args):
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.workers),
+                "completed": self._completed,
+            }
+
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto",
+                           bcrypt__rounds=BCRYPT_ROUNDS, bcrypt__min_rounds=BCRYPT_MIN_ROUNDS)
+password_pool = PasswordPool(PASSWORD_HASH_WORKERS)
 security = HTTPBearer()
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+redeemed_tickets = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=TICKET_TTL)
+# Called with the user id by invalidate_user, e.g. to close that user's event streams.
+invalidation_listeners: List[Callable[[int], None]] = []
+
+def api_key_header(name: str, env: str):
+    """Dependency that requires header ``name`` to carry the key in environment variable ``env``.
+
+    Used for operator endpoints; if the variable is unset every request is refused.
+    """
+    expected = os.getenv(env)
+
+    def require_key(key: Optional[str] = Header(None, alias=name)):
+        if not expected or not key or not secrets.compare_digest(key, expected):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
+
+    return require_key
+
 
 class TokenData(BaseModel):
     email: Optional[str] = None
     user_type: Optional[str] = None
+    user_id: Optional[int] = None
 
 def truncate_password(password: str) -> str:
     if not isinstance(password, str):
@@ -32,14 +110,45 @@ def truncate_password(password: str) -> str:
         password_bytes = password_bytes[:72]
     return password_bytes.decode('utf-8', 'ignore')
 
-def verify_password(plain_password, hashed_password):
+def _verify_password(plain_password, hashed_password):
     plain_password = truncate_password(plain_password).strip()
     return pwd_context.verify(plain_password, hashed_password)
 
-def get_password_hash(password):
+def _verify_and_update_password(plain_password, hashed_password):
+    plain_password = truncate_password(plain_password).strip()
+    valid, new_hash = pwd_context.verify_and_update(plain_password, hashed_password)
+    return valid, new_hash.strip() if new_hash else None
+
+def _get_password_hash(password):
     password = truncate_password(password)
     return pwd_context.hash(password).strip()
 
+def verify_password(plain_password, hashed_password):
+    return password_pool.submit(_verify_password, plain_password, hashed_password).result()
+
+def get_password_hash(password):
+    return password_pool.submit(_get_password_hash, password).result()
+
+def get_password_hashes(passwords):
+    """Hash many passwords concurrently on the password pool."""
+    futures = [password_pool.submit(_get_password_hash, password) for password in passwords]
+    return [future.result() for future in futures]
+
+async def verify_password_async(plain_password, hashed_password):
+    return await password_pool.run(_verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await password_pool.run(_get_password_hash, password)
+
+async def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """Verify a password and, if PASSWORD_REHASH is on, return a replacement hash.
+
+    The second item is only set when the stored hash uses deprecated settings.
+    """
+    if not PASSWORD_REHASH:
+        return await verify_password_async(plain_password, hashed_password), None
+    return await password_pool.run(_verify_and_update_password, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -50,40 +159,159 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security),
-                           db: Session = Depends(get_db)):
+# Never cached: the principal entry lives for the whole token lifetime.
+SNAPSHOT_EXCLUDE = frozenset({"password"})
+
+
+def _snapshot(obj) -> dict:
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs
+            if attr.key not in SNAPSHOT_EXCLUDE}
+
+
+def _detached(model, values: dict):
+    # Rebuild a cached row as a detached instance with every snapshotted
+    # column loaded, so handlers can read it without a session or SQL.
+    # Excluded columns stay unloaded and raise DetachedInstanceError if read.
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    return obj
+
+
+def user_with_role_statement(*criteria):
+    """Select a USER and its caregiver/member rows with a single outer-joined query."""
+    return select(models.USER, models.CAREGIVER, models.MEMBER) \
+        .outerjoin(models.CAREGIVER, models.CAREGIVER.caregiver_user_id == models.USER.user_id) \
+        .outerjoin(models.MEMBER, models.MEMBER.member_user_id == models.USER.user_id) \
+        .where(*criteria) \
+        .limit(1)
+
+
+async def get_user_with_role(db: AsyncSession, *criteria):
+    """Return ``(user, caregiver, member)`` or ``None`` if no user matches."""
+    result = await db.execute(user_with_role_statement(*criteria))
+    return result.first()
+
+
+def user_type_of(caregiver, member) -> str:
+    return "caregiver" if caregiver else "member" if member else "unknown"
+
+
+def principal_user_type(entry: dict) -> str:
+    return user_type_of(entry["caregiver"], entry["member"])
+
+
+def invalidate_user(user_id: int):
+    """Drop the cached principal of ``user_id`` after its profile changed.
+
+    Only affects this worker: the cache is per process, so other workers keep
+    serving their entry until it expires after ``PRINCIPAL_CACHE_TTL``
+    seconds. Lower that setting if profile changes must show up sooner.
+    """
+    principal_cache.discard_where(lambda entry: entry["user"]["user_id"] == user_id)
+    for listener in invalidation_listeners:
+        listener(user_id)
+
+
+def create_ticket(purpose: str, user_id: int, expires_at: float) -> str:
+    """Short-lived, single-use token for ``purpose`` only (e.g. an EventSource URL).
+
+    ``expires_at`` is when the access token it was issued for expires; the
+    ticket itself lasts at most ``TICKET_TTL`` seconds.
+    """
+    now = time.time()
+    claims = {
+        "purpose": purpose,
+        "user_id": user_id,
+        "session_exp": int(expires_at),
+        "exp": int(min(now + TICKET_TTL, expires_at)),
+        "jti": secrets.token_urlsafe(12),
+    }
+    return jwt.encode(claims, SECRET_KEY, algorithm=ALGORITHM)
+
+
+def redeem_ticket(ticket: str, purpose: str) -> Tuple[int, float]:
+    """Return ``(user_id, expires_at)`` for a valid ticket, at most once per worker."""
+    invalid = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired ticket")
+    try:
+        claims = jwt.decode(ticket, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise invalid
+    if claims.get("purpose") != purpose or redeemed_tickets.get(claims.get("jti")) is not None:
+        raise invalid
+    # jose compares exp with the current time in whole seconds, so the ticket
+    # still decodes for up to a second after exp; remember it that long.
+    redeemed_tickets.set(claims["jti"], True, ttl=claims["exp"] + 1 - time.time())
+    return claims["user_id"], claims["session_exp"]
+
+
+async def get_principal(credentials: HTTPAuthorizationCredentials = Depends(security),
+                        db: AsyncSession = Depends(get_async_db)) -> dict:
+    token = credentials.credentials
+    entry = principal_cache.get(token)
+    if entry is not None:
+        return entry
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         user_type: str = payload.get("user_type")
-        if email is None or user_type is None:
+        # Tickets are signed with the same key but are not access tokens.
+        if email is None or user_type is None or "purpose" in payload:
             raise credentials_exception
-        token_data = TokenData(email=email, user_type=user_type)
-    except JWTError:
+        token_data = TokenData(email=email, user_type=user_type, user_id=payload.get("user_id"))
+    except (JWTError, ValueError):
         raise credentials_exception
 
-    user = db.query(models.USER).filter(models.USER.email == token_data.email).first()
-    if user is None:
+    # Tokens issued before user_id was added to the claims fall back to email.
+    if token_data.user_id is not None:
+        row = await get_user_with_role(db, models.USER.user_id == token_data.user_id)
+    else:
+        row = await get_user_with_role(db, models.USER.email == token_data.email)
+    if row is None:
         raise credentials_exception
-    return user
 
-async def get_current_caregiver(current_user: models.USER = Depends(get_current_user), db: Session = Depends(get_db)):
-    caregiver = db.query(models.CAREGIVER) \
-        .filter(models.CAREGIVER.caregiver_user_id == current_user.user_id) \
-        .options(joinedload(models.CAREGIVER.user)).first()
+    user, caregiver, member = row
+    entry = {
+        "user": _snapshot(user),
+        "caregiver": _snapshot(caregiver) if caregiver else None,
+        "member": _snapshot(member) if member else None,
+        "expires_at": payload.get("exp", 0),
+    }
+    expires_in = entry["expires_at"] - time.time()
+    principal_cache.set(token, entry, ttl=expires_in)
+    return entry
+
+
+def _load_profile(entry: dict, role: str):
+    if entry[role] is None:
+        return None
+    model = models.CAREGIVER if role == "caregiver" else models.MEMBER
+
+    user = _detached(models.USER, entry["user"])
+    profile = _detached(model, entry[role])
+    set_committed_value(profile, "user", user)
+    set_committed_value(user, role, profile)
+    return profile
+
+
+# The dependencies below only rebuild cached snapshots (no session, no SQL),
+# so they cost nothing on the event loop and suit sync and async handlers.
+async def get_current_user(entry: dict = Depends(get_principal)):
+    return _detached(models.USER, entry["user"])
+
+async def get_current_caregiver(entry: dict = Depends(get_principal)):
+    caregiver = _load_profile(entry, "caregiver")
     if not caregiver:
         raise HTTPException(status_code=403, detail="Not a caregiver")
     return caregiver
 
-async def get_current_member(current_user: models.USER = Depends(get_current_user), db: Session = Depends(get_db)):
-    member = db.query(models.MEMBER) \
-        .filter(models.MEMBER.member_user_id == current_user.user_id) \
-        .options(joinedload(models.MEMBER.user)).first()
+async def get_current_member(entry: dict = Depends(get_principal)):
+    member = _load_profile(entry, "member")
     if not member:
         raise HTTPException(status_code=403, detail="Not a member")
-    return member
\ No newline at end of file
+    return member
@@ -0,0 +1,12 @@
+"""Seed a synthetic population and benchmark every router in-process.
+
+Usage::
+
+    python -m app.benchmark seed --scale 10000
+    python -m app.benchmark run --requests 200 --concurrency 16 --output bench.json
+
+Both commands use ``DATABASE_URL`` unless ``--database-url`` is given; point
+it at a scratch database, since ``run`` writes through the API. Results are
+JSON with p50/p95/p99 latency, throughput and SQL queries per request for
+each scenario, so runs from different commits can be diffed.
+"""
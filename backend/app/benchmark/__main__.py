@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import secrets
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.benchmark", description="Seed and benchmark the API.")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="fill an empty database with synthetic data")
+    seed_parser.add_argument("--scale", type=int, default=10000, help="number of users")
+    for name in ("caregivers", "members", "jobs", "applications", "appointments"):
+        seed_parser.add_argument(f"--{name}", type=int, help=f"override the number of {name}")
+    seed_parser.add_argument("--batch-size", type=int, default=5000)
+    seed_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = commands.add_parser("run", help="benchmark the seeded database")
+    run_parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    run_parser.add_argument("--concurrency", type=int, default=16)
+    run_parser.add_argument("--accounts", type=int, default=20, help="caregivers and members to log in as")
+    run_parser.add_argument("--scenario", action="append", help="repeat to run only these scenarios")
+    run_parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    run_parser.add_argument("--output", help="write JSON here instead of stdout")
+    run_parser.add_argument("--seed", type=int, default=0)
+
+    budgets_parser = commands.add_parser("budgets", help="fail if any scenario goes over its route's query budget")
+    budgets_parser.add_argument("--requests", type=int, default=3, help="requests per scenario")
+    budgets_parser.add_argument("--scenario", action="append", help="repeat to check only these scenarios")
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set and --database-url was not given")
+    # The app reads its settings at import time, so they must be in place first.
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("SECRET_KEY", secrets.token_hex(32))
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("ONBOARDING_API_KEY", secrets.token_hex(16))
+    os.environ.setdefault("REPORTS_API_KEY", secrets.token_hex(16))
+
+    from ..database import engine
+
+    if args.command == "seed":
+        from .seed import population, seed
+
+        counts = population(args.scale, caregivers=args.caregivers, members=args.members, jobs=args.jobs,
+                            applications=args.applications, appointments=args.appointments)
+        seed(engine, counts, batch_size=args.batch_size, rng_seed=args.seed)
+        return 0
+
+    from .runner import SCENARIOS, run
+
+    if args.command == "budgets":
+        # One request at a time and few accounts, so the principal cache is
+        # cold for some requests and the budgets cover the authentication query.
+        results = asyncio.run(run(args.requests, 1, 2, args.scenario))
+        failures = {name: result["over_budget"] for name, result in results.items() if "over_budget" in result}
+        for name, messages in failures.items():
+            for message in messages:
+                print(f"{name}: {message}", file=sys.stderr)
+        print(f"{len(results) - len(failures)}/{len(results)} scenarios within budget")
+        return 1 if failures else 0
+
+    if args.list:
+        print("\n".join(SCENARIOS))
+        return 0
+    results = asyncio.run(run(args.requests, args.concurrency, args.accounts, args.scenario, args.seed))
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "database": engine.dialect.name,
+            "python": platform.python_version(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            out.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,410 @@
+"""Drive the API in-process and collect latency and query statistics.
+
+Requests go through ``httpx.ASGITransport`` straight into the ASGI app, so
+the numbers include routing, validation, serialization and the database,
+but no network or server process.
+"""
+import asyncio
+import io
+import itertools
+import os
+import random
+import time
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+from sqlalchemy import func, select
+
+from .. import models
+from ..database import SessionLocal, async_engine, track_queries
+from .seed import PASSWORD, caregiver_email, member_email
+
+Scenario = Callable[[httpx.AsyncClient, "Context", int], Awaitable[httpx.Response]]
+SCENARIOS: Dict[str, Scenario] = {}
+
+
+def scenario(name: str):
+    def register(fn: Scenario) -> Scenario:
+        SCENARIOS[name] = fn
+        return fn
+    return register
+
+
+class Context:
+    """Logged-in accounts and the ids that write scenarios hand to each other."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.caregivers: List[dict] = []
+        self.members: List[dict] = []
+        self.caregiver_count = 0
+        self.member_count = 0
+        self.job_count = 0
+        self.created_jobs: List[tuple] = []
+        self.created_applications: List[tuple] = []
+        self.created_appointments: List[tuple] = []
+        self.registrations = itertools.count()
+        self.future_day = itertools.count()
+        self.last_appointment_date = date.today()
+
+    def caregiver(self, i: int) -> dict:
+        return self.caregivers[i % len(self.caregivers)]
+
+    def member(self, i: int) -> dict:
+        return self.members[i % len(self.members)]
+
+    def random_job(self) -> int:
+        return self.rng.randint(1, self.job_count)
+
+    # Scenarios that need rows from an earlier write scenario fall back to a
+    # missing id (and measure the 404 path) when it was not selected.
+    def created_job(self, i: int) -> tuple:
+        if not self.created_jobs:
+            return self.member(i), 0
+        return self.created_jobs[i % len(self.created_jobs)]
+
+    def created_appointment(self, i: int) -> tuple:
+        if not self.created_appointments:
+            return self.member(i), 0
+        return self.created_appointments[i % len(self.created_appointments)]
+
+
+async def _login(client: httpx.AsyncClient, email: str) -> dict:
+    response = await client.post("/token", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    token = response.json()
+    return {"user_id": token["user_id"], "headers": {"Authorization": f"Bearer {token['access_token']}"}}
+
+
+async def prepare(client: httpx.AsyncClient, accounts: int, rng_seed: int = 0) -> Context:
+    ctx = Context(random.Random(rng_seed))
+    with SessionLocal() as db:
+        ctx.caregiver_count = db.scalar(select(func.count()).select_from(models.CAREGIVER))
+        ctx.member_count = db.scalar(select(func.count()).select_from(models.MEMBER))
+        ctx.job_count = db.scalar(select(func.max(models.JOB.job_id))) or 0
+        ctx.last_appointment_date = db.scalar(select(func.max(models.APPOINTMENT.appointment_date))) or date.today()
+    if not ctx.caregiver_count or not ctx.member_count or not ctx.job_count:
+        raise SystemExit("The database is not seeded; run the seed command first")
+
+    ctx.caregivers = [await _login(client, caregiver_email(i))
+                      for i in range(1, min(accounts, ctx.caregiver_count) + 1)]
+    ctx.members = [await _login(client, member_email(i))
+                   for i in range(1, min(accounts, ctx.member_count) + 1)]
+    return ctx
+
+
+@scenario("token")
+async def _token(client, ctx, i):
+    return await client.post("/token", json={"email": caregiver_email(i % ctx.caregiver_count + 1), "password": PASSWORD})
+
+
+@scenario("caregivers.register")
+async def _caregivers_register(client, ctx, i):
+    n = next(ctx.registrations)
+    return await client.post("/caregivers", json={
+        "email": f"bench-caregiver-{n}-{time.time_ns()}@bench.local", "given_name": "Bench", "surname": str(n),
+        "city": "Almaty", "phone_number": "+7 700", "password": PASSWORD, "gender": "F",
+        "caregiving_type": "elderly", "hourly_rate": 20,
+    })
+
+
+@scenario("caregivers.list")
+async def _caregivers_list(client, ctx, i):
+    return await client.get("/caregivers", params={"city": "Almaty", "caregiving_type": "elderly", "gender": "F"})
+
+
+@scenario("caregivers.page")
+async def _caregivers_page(client, ctx, i):
+    return await client.get("/caregivers/page", params={"limit": 50, "caregiving_type": "elderly"})
+
+
+@scenario("caregivers.search")
+async def _caregivers_search(client, ctx, i):
+    return await client.get("/caregivers/search", params={"caregiving_type": "elderly", "max_hourly_rate": 30, "limit": 100})
+
+
+@scenario("caregivers.nearby")
+async def _caregivers_nearby(client, ctx, i):
+    return await client.get("/caregivers/nearby", headers=ctx.member(i)["headers"],
+                            params={"radius_km": 15, "caregiving_type": "elderly", "limit": 50})
+
+
+@scenario("caregivers.me")
+async def _caregivers_me(client, ctx, i):
+    return await client.get("/caregivers/my_caregiver_data", headers=ctx.caregiver(i)["headers"])
+
+
+@scenario("caregivers.update")
+async def _caregivers_update(client, ctx, i):
+    caregiver = ctx.caregiver(i)
+    return await client.put("/caregivers/my_caregiver_data", headers=caregiver["headers"], json={
+        "caregiver_user_id": caregiver["user_id"], "hourly_rate": round(ctx.rng.uniform(5, 50), 2),
+    })
+
+
+@scenario("members.register")
+async def _members_register(client, ctx, i):
+    n = next(ctx.registrations)
+    return await client.post("/members", json={
+        "email": f"bench-member-{n}-{time.time_ns()}@bench.local", "given_name": "Bench", "surname": str(n),
+        "city": "Almaty", "phone_number": "+7 700", "password": PASSWORD,
+        "house_number": "1", "street": "Main", "town": "Almaty",
+    })
+
+
+@scenario("members.list")
+async def _members_list(client, ctx, i):
+    return await client.get("/members", params={"stream": "ndjson"})
+
+
+@scenario("members.me")
+async def _members_me(client, ctx, i):
+    return await client.get("/members/my_member_data", headers=ctx.member(i)["headers"])
+
+
+@scenario("members.update")
+async def _members_update(client, ctx, i):
+    member = ctx.member(i)
+    return await client.put("/members/my_member_data", headers=member["headers"], json={
+        "member_user_id": member["user_id"], "house_rules": f"Rule {i}",
+    })
+
+
+@scenario("members.address")
+async def _members_address(client, ctx, i):
+    return await client.get("/members/my_address_data", headers=ctx.member(i)["headers"])
+
+
+@scenario("members.address_update")
+async def _members_address_update(client, ctx, i):
+    member = ctx.member(i)
+    return await client.put("/members/my_address_data", headers=member["headers"], json={
+        "member_user_id": member["user_id"], "house_number": str(i), "street": "Main", "town": "Almaty",
+    })
+
+
+@scenario("jobs.create")
+async def _jobs_create(client, ctx, i):
+    member = ctx.member(i)
+    response = await client.post("/jobs", headers=member["headers"], json={
+        "member_user_id": member["user_id"], "required_caregiving_type": "elderly", "other_requirements": "Benchmark",
+    })
+    if response.status_code == 200:
+        ctx.created_jobs.append((member, response.json()["job_id"]))
+    return response
+
+
+@scenario("jobs.list")
+async def _jobs_list(client, ctx, i):
+    return await client.get("/jobs", headers=ctx.member(i)["headers"],
+                            params={"posted_from": (date.today() - timedelta(days=7)).isoformat()})
+
+
+@scenario("jobs.page")
+async def _jobs_page(client, ctx, i):
+    return await client.get("/jobs/page", headers=ctx.member(i)["headers"], params={"limit": 50})
+
+
+@scenario("jobs.recommended")
+async def _jobs_recommended(client, ctx, i):
+    member, job_id = ctx.created_job(i)
+    return await client.get(f"/jobs/{job_id}/recommended_caregivers", headers=member["headers"])
+
+
+@scenario("jobs.update")
+async def _jobs_update(client, ctx, i):
+    member, job_id = ctx.created_job(i)
+    return await client.put(f"/jobs/{job_id}", headers=member["headers"], json={
+        "member_user_id": member["user_id"], "required_caregiving_type": "babysitter", "other_requirements": str(i),
+    })
+
+
+@scenario("job_applications.create")
+async def _applications_create(client, ctx, i):
+    caregiver = ctx.caregiver(i)
+    _, job_id = ctx.created_job(i)
+    response = await client.post("/job_applications", headers=caregiver["headers"], json={
+        "caregiver_user_id": caregiver["user_id"], "job_id": job_id,
+    })
+    if response.status_code == 200:
+        ctx.created_applications.append((caregiver, job_id))
+    return response
+
+
+@scenario("job_applications.bulk")
+async def _applications_bulk(client, ctx, i):
+    return await client.post("/job_applications/bulk", headers=ctx.caregiver(i)["headers"], json={
+        "job_ids": [ctx.random_job() for _ in range(20)],
+    })
+
+
+@scenario("job_applications.delete")
+async def _applications_delete(client, ctx, i):
+    if not ctx.created_applications:
+        return await client.delete("/job_applications/0/0", headers=ctx.caregiver(i)["headers"])
+    caregiver, job_id = ctx.created_applications.pop()
+    return await client.delete(f"/job_applications/{job_id}/{caregiver['user_id']}", headers=caregiver["headers"])
+
+
+@scenario("jobs.delete")
+async def _jobs_delete(client, ctx, i):
+    if not ctx.created_jobs:
+        return await client.delete("/jobs/0", headers=ctx.member(i)["headers"])
+    member, job_id = ctx.created_jobs.pop()
+    return await client.delete(f"/jobs/{job_id}", headers=member["headers"])
+
+
+@scenario("appointments.availability")
+async def _appointments_availability(client, ctx, i):
+    return await client.get("/appointments/availability", headers=ctx.member(i)["headers"], params={
+        "date_from": date.today().isoformat(), "date_to": (date.today() + timedelta(days=29)).isoformat(),
+        "duration_hours": 2, "caregiving_type": "elderly", "limit": 100,
+    })
+
+
+@scenario("appointments.create")
+async def _appointments_create(client, ctx, i):
+    member, caregiver = ctx.member(i), ctx.caregiver(i)
+    # Each booking gets a day after every existing appointment, so none conflict.
+    day = ctx.last_appointment_date + timedelta(days=1 + next(ctx.future_day))
+    response = await client.post("/appointments", headers=member["headers"], json={
+        "caregiver_user_id": caregiver["user_id"], "member_user_id": member["user_id"],
+        "appointment_date": day.isoformat(), "appointment_time": "10:00:00", "work_hours": 2, "status": "pending",
+    })
+    if response.status_code == 200:
+        ctx.created_appointments.append((member, response.json()["appointment_id"]))
+    return response
+
+
+@scenario("appointments.status")
+async def _appointments_status(client, ctx, i):
+    member, appointment_id = ctx.created_appointment(i)
+    return await client.put(f"/appointments/{appointment_id}/accepted", headers=member["headers"])
+
+
+@scenario("appointments.status_batch")
+async def _appointments_status_batch(client, ctx, i):
+    member, _ = ctx.created_appointment(i)
+    ids = [appointment_id for owner, appointment_id in ctx.created_appointments if owner is member][:20]
+    return await client.put("/appointments/status", headers=member["headers"],
+                            json=[{"appointment_id": appointment_id, "status": "accepted"} for appointment_id in ids])
+
+
+@scenario("user.me")
+async def _user_me(client, ctx, i):
+    return await client.get("/user/me", headers=ctx.member(i)["headers"])
+
+
+@scenario("user.jobs")
+async def _user_jobs(client, ctx, i):
+    return await client.get("/user/jobs", headers=ctx.member(i)["headers"])
+
+
+@scenario("user.job_applications")
+async def _user_job_applications(client, ctx, i):
+    return await client.get("/user/job_applications", headers=ctx.member(i)["headers"])
+
+
+@scenario("user.my_applications")
+async def _user_my_applications(client, ctx, i):
+    return await client.get("/user/my_applications", headers=ctx.caregiver(i)["headers"])
+
+
+@scenario("user.caregiver_appointments")
+async def _user_caregiver_appointments(client, ctx, i):
+    return await client.get("/user/caregiver_appointments", headers=ctx.caregiver(i)["headers"])
+
+
+@scenario("user.member_appointments")
+async def _user_member_appointments(client, ctx, i):
+    return await client.get("/user/member_appointments", headers=ctx.member(i)["headers"])
+
+
+@scenario("events.ticket")
+async def _events_ticket(client, ctx, i):
+    # Only the ticket: ASGITransport buffers the whole response, so an open
+    # GET /events stream would never return.
+    return await client.post("/events/ticket", headers=ctx.member(i)["headers"])
+
+
+@scenario("onboarding.caregivers")
+async def _onboarding_caregivers(client, ctx, i):
+    n = next(ctx.registrations)
+    rows = "\n".join(
+        f"bench-onboard-{n}-{k}-{time.time_ns()}@bench.local,Bench,{k},Almaty,{PASSWORD},F,elderly,20"
+        for k in range(10)
+    )
+    body = "email,given_name,surname,city,password,gender,caregiving_type,hourly_rate\n" + rows + "\n"
+    return await client.post("/onboarding/caregivers", headers={"X-Onboarding-Key": os.environ["ONBOARDING_API_KEY"]},
+                             files={"file": ("caregivers.csv", io.BytesIO(body.encode()), "text/csv")})
+
+
+@scenario("reports.caregivers")
+async def _reports_caregivers(client, ctx, i):
+    return await client.get("/reports/caregivers", headers={"X-Reports-Key": os.environ["REPORTS_API_KEY"]},
+                            params={"period": "month", "date_from": (date.today() - timedelta(days=30)).isoformat()})
+
+
+def percentiles(values: List[float]) -> dict:
+    p50, p95, p99 = np.percentile(np.asarray(values), [50, 95, 99])
+    return {"p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3)}
+
+
+async def run_scenario(client: httpx.AsyncClient, ctx: Context, fn: Scenario, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, queries, statuses, over_budget = [], [], {}, []
+
+    async def one(i: int):
+        async with semaphore:
+            # The app's own per-request block rolls its totals up into this one.
+            with track_queries() as stats:
+                started = time.perf_counter()
+                response = await fn(client, ctx, i)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries.append(stats.count)
+            over_budget.extend(stats.over_budget)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    result = {
+        "requests": requests,
+        "errors": sum(count for code, count in statuses.items() if code >= 400),
+        "status_codes": {str(code): count for code, count in sorted(statuses.items())},
+    }
+    if latencies:
+        result.update({
+            "latency_ms": dict(percentiles(latencies), mean=round(float(np.mean(latencies)), 3)),
+            "throughput_rps": round(requests / elapsed, 1) if elapsed else None,
+            "queries_per_request": {"mean": round(float(np.mean(queries)), 2), "max": int(max(queries))},
+        })
+    if over_budget:
+        result["over_budget"] = sorted(set(over_budget))
+    return result
+
+
+async def run(requests: int, concurrency: int, accounts: int = 20, names: Optional[List[str]] = None,
+              rng_seed: int = 0) -> Dict[str, dict]:
+    from ..main import app
+
+    selected = names or list(SCENARIOS)
+    unknown = set(selected) - set(SCENARIOS)
+    if unknown:
+        raise SystemExit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            ctx = await prepare(client, accounts, rng_seed)
+            results = {}
+            # SCENARIOS is in dependency order (creates before updates and deletes).
+            for name in SCENARIOS:
+                if name in selected:
+                    results[name] = await run_scenario(client, ctx, SCENARIOS[name], requests, concurrency)
+            return results
+    finally:
+        # Pooled aiosqlite connections keep non-daemon threads alive past the event loop.
+        await async_engine.dispose()
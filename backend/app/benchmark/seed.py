@@ -0,0 +1,162 @@
+"""Synthetic population for benchmarks.
+
+Every seeded account uses the password ``PASSWORD``; it is hashed once and
+the hash is shared, so seeding a million users does not run a million bcrypt
+rounds.
+"""
+import random
+import sys
+import time
+from datetime import date, time as clock, timedelta
+from typing import Iterator
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.engine import Engine
+
+from .. import geo, migrate, models
+from ..auth import get_password_hash
+from ..onboarding import batches
+from ..snapshot import reset_sequences
+
+PASSWORD = "benchmark"
+CITY_COORDINATES = {
+    "Almaty": (43.2389, 76.8897),
+    "Astana": (51.1694, 71.4491),
+    "Shymkent": (42.3417, 69.5901),
+    "Karaganda": (49.8047, 73.1094),
+    "Aktobe": (50.2839, 57.1670),
+    "Taraz": (42.9000, 71.3667),
+    "Pavlodar": (52.2873, 76.9674),
+    "Oskemen": (49.9483, 82.6275),
+}
+CITIES = list(CITY_COORDINATES)
+# People are spread this far (in degrees) around their city centre.
+CITY_SPREAD = 0.15
+CAREGIVING_TYPES = ["babysitter", "elderly", "playmate"]
+GENDERS = ["F", "M"]
+STATUSES = ["pending", "accepted", "declined", "cancelled"]
+DEFAULT_BATCH_SIZE = 5000
+
+
+def population(scale: int, **overrides) -> dict:
+    """Row counts for ``scale`` users, half caregivers and half members."""
+    caregivers = scale // 2
+    members = scale - caregivers
+    counts = {
+        "caregivers": caregivers,
+        "members": members,
+        "jobs": members,
+        "applications": members * 2,
+        "appointments": members * 2,
+    }
+    counts.update({key: value for key, value in overrides.items() if value is not None})
+    return counts
+
+
+def caregiver_email(index: int) -> str:
+    return f"caregiver{index}@bench.local"
+
+
+def member_email(index: int) -> str:
+    return f"member{index}@bench.local"
+
+
+def _near(rng: random.Random, city: str) -> geo.Location:
+    latitude, longitude = CITY_COORDINATES[city]
+    return (round(latitude + rng.uniform(-CITY_SPREAD, CITY_SPREAD), 6),
+            round(longitude + rng.uniform(-CITY_SPREAD, CITY_SPREAD), 6))
+
+
+def _insert(conn, model, rows: Iterator[dict], batch_size: int):
+    started = time.perf_counter()
+    count = 0
+    for batch in batches(rows, batch_size):
+        conn.execute(insert(model), batch)
+        count += len(batch)
+    elapsed = time.perf_counter() - started
+    print(f"{model.__tablename__}: {count} rows in {elapsed:.1f}s", file=sys.stderr)
+
+
+def seed(engine: Engine, counts: dict, batch_size: int = DEFAULT_BATCH_SIZE, rng_seed: int = 0):
+    """Fill an empty database with ``counts`` rows (see ``population``).
+
+    Caregivers get user ids ``1..caregivers``, members the ids after them.
+    """
+    rng = random.Random(rng_seed)
+    caregivers, members = counts["caregivers"], counts["members"]
+    if not caregivers or not members:
+        raise ValueError("Need at least one caregiver and one member")
+    password_hash = get_password_hash(PASSWORD)
+    first_member = caregivers + 1
+    today = date.today()
+
+    migrate.upgrade(engine)
+    with engine.begin() as conn:
+        if conn.execute(select(func.count()).select_from(models.USER)).scalar():
+            raise SystemExit("Refusing to seed a non-empty database")
+
+        _insert(conn, models.GEOCODE, ({
+            "name": geo.normalize(city), "latitude": latitude, "longitude": longitude,
+        } for city, (latitude, longitude) in CITY_COORDINATES.items()), batch_size)
+        _insert(conn, models.USER, ({
+            "user_id": user_id,
+            "email": caregiver_email(user_id) if user_id < first_member else member_email(user_id - caregivers),
+            "given_name": f"Given{user_id}",
+            "surname": f"Surname{user_id}",
+            "city": city,
+            "phone_number": f"+7 700 {user_id:07d}",
+            "profile_description": None,
+            "password": password_hash,
+            **geo.user_columns(_near(rng, city)),
+        } for user_id, city in ((user_id, rng.choice(CITIES)) for user_id in range(1, caregivers + members + 1))),
+            batch_size)
+        _insert(conn, models.CAREGIVER, ({
+            "caregiver_user_id": user_id,
+            "photo": None,
+            "gender": rng.choice(GENDERS),
+            "caregiving_type": rng.choice(CAREGIVING_TYPES),
+            "hourly_rate": round(rng.uniform(5, 50), 2),
+        } for user_id in range(1, first_member)), batch_size)
+        _insert(conn, models.MEMBER, ({
+            "member_user_id": user_id,
+            "house_rules": "No pets",
+            "dependent_description": None,
+        } for user_id in range(first_member, first_member + members)), batch_size)
+        _insert(conn, models.ADDRESS, ({
+            "member_user_id": user_id,
+            "house_number": str(rng.randint(1, 200)),
+            "street": f"Street {rng.randint(1, 500)}",
+            "town": town,
+            **geo.address_columns(_near(rng, town)),
+        } for user_id, town in ((user_id, rng.choice(CITIES)) for user_id in range(first_member, first_member + members))),
+            batch_size)
+        _insert(conn, models.JOB, ({
+            "job_id": job_id,
+            "member_user_id": rng.randint(first_member, first_member + members - 1),
+            "required_caregiving_type": rng.choice(CAREGIVING_TYPES),
+            "other_requirements": None,
+            "date_posted": today - timedelta(days=rng.randint(0, 365)),
+        } for job_id in range(1, counts["jobs"] + 1)), batch_size)
+
+        applications = set()
+        target = min(counts["applications"], counts["jobs"] * caregivers)
+        while len(applications) < target:
+            applications.add((rng.randint(1, caregivers), rng.randint(1, counts["jobs"])))
+        _insert(conn, models.JOB_APPLICATION, ({
+            "caregiver_user_id": caregiver_user_id,
+            "job_id": job_id,
+            "date_applied": today - timedelta(days=rng.randint(0, 30)),
+        } for caregiver_user_id, job_id in applications), batch_size)
+
+        _insert(conn, models.APPOINTMENT, ({
+            "appointment_id": appointment_id,
+            "caregiver_user_id": rng.randint(1, caregivers),
+            "member_user_id": rng.randint(first_member, first_member + members - 1),
+            "appointment_date": today + timedelta(days=rng.randint(-180, 180)),
+            "appointment_time": clock(rng.randint(7, 18)),
+            "work_hours": rng.randint(1, 4),
+            "status": rng.choice(STATUSES),
+        } for appointment_id in range(1, counts["appointments"] + 1)), batch_size)
+
+        for model in (models.USER, models.JOB, models.APPOINTMENT):
+            reset_sequences(conn, model.__table__)
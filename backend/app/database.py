@@ -1,25 +1,273 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.sql.expression import UpdateBase
+from contextlib import contextmanager
+from contextvars import ContextVar
+import itertools
 import os
+import time
 from dotenv import load_dotenv
 
+from . import metrics
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
+# Comma-separated; read-only handlers are spread across these round-robin.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str) -> str:
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+
+
+class _TimedCheckout:
+    """Pool mixin that records how long each checkout waited for a connection.
+
+    Wraps ``Pool.connect()``, the public checkout entry point engines call,
+    so the time includes waiting for a free slot and the pre-ping.
+    """
+
+    metrics_label = "sync"
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            metrics.POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started, self.metrics_label)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    metrics_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_label = "async"
+
+
+def _replica_pool(label: str, base=TimedQueuePool):
+    # A subclass rather than an instance attribute, so the label survives pool.recreate().
+    return type(f"{base.__name__}_{label}", (base,), {"metrics_label": label})
+
 
 engine = create_engine(
     DATABASE_URL,
     echo=False,
+    poolclass=TimedQueuePool,
     pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20)
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    echo=False,
+    poolclass=TimedAsyncQueuePool,
+    pool_pre_ping=True,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+replica_engines = {
+    f"replica{index}": create_engine(
+        url,
+        echo=False,
+        poolclass=_replica_pool(f"replica{index}"),
+        pool_pre_ping=True,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW)
+    for index, url in enumerate(DATABASE_REPLICA_URLS)
+}
+async_replica_engines = {
+    f"replica{index}_async": create_async_engine(
+        to_async_url(url),
+        echo=False,
+        poolclass=_replica_pool(f"replica{index}_async", TimedAsyncQueuePool),
+        pool_pre_ping=True,
+        pool_size=POOL_SIZE,
+        max_overflow=MAX_OVERFLOW)
+    for index, url in enumerate(DATABASE_REPLICA_URLS)
+}
+
+
+class ReadSession(Session):
+    """Session for read-only handlers.
+
+    Each session picks the next replica round-robin. Any write, or a locking
+    read, moves it to the primary for the rest of its life, so a handler
+    never reads a replica after writing. Without replicas it is a plain
+    primary session.
+    """
+
+    primary = engine
+    replicas = list(replica_engines.values())
+    _replica_cycle = itertools.cycle(replicas)
+
+    def __init__(self, **kw):
+        super().__init__(**kw)
+        self.replica = next(self._replica_cycle) if self.replicas else None
+        self.on_primary = self.replica is None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        # Pending ORM changes mean this call comes from a flush.
+        if not self.on_primary and (
+                self.new or self.deleted or self.dirty
+                or isinstance(clause, UpdateBase)
+                or getattr(clause, "_for_update_arg", None) is not None):
+            self.on_primary = True
+        return self.primary if self.on_primary else self.replica
+
+
+class AsyncReadSession(ReadSession):
+    """``ReadSession`` behind an ``AsyncSession``, routing between the async engines."""
+
+    primary = async_engine.sync_engine
+    replicas = [replica.sync_engine for replica in async_replica_engines.values()]
+    _replica_cycle = itertools.cycle(replicas)
+
+
+ReadSessionLocal = sessionmaker(class_=ReadSession, autoflush=False, autocommit=False)
+AsyncReadSessionLocal = async_sessionmaker(sync_session_class=AsyncReadSession, autoflush=False,
+                                           expire_on_commit=False)
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "budget", "over_budget")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.budget = None
+        # Messages for requests in this block that went over their budget.
+        self.over_budget = []
+
+
+_query_stats: ContextVar = ContextVar("query_stats", default=None)
+
+
+def current_query_stats():
+    return _query_stats.get()
+
+
+@contextmanager
+def track_queries():
+    """Count SQL statements and their time for the code run inside the block.
+
+    Sync handlers run in a threadpool with a copy of the context, which still
+    points at the same ``QueryStats``, so their queries are counted too.
+    Nested blocks add their totals to the enclosing one when they exit.
+    """
+    parent = _query_stats.get()
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+        if parent is not None:
+            parent.count += stats.count
+            parent.seconds += stats.seconds
+            parent.over_budget.extend(stats.over_budget)
+
+
+def _instrument(target, label: str):
+    @event.listens_for(target, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(target, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        metrics.SQL_QUERIES.inc(label)
+        metrics.SQL_TIME.inc(label, amount=elapsed)
+        stats = _query_stats.get()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+
+    @event.listens_for(target, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            conn.info["query_started"].pop()
+
+
+_instrument(engine, "sync")
+_instrument(async_engine.sync_engine, "async")
+for _label, _replica in replica_engines.items():
+    _instrument(_replica, _label)
+for _label, _replica in async_replica_engines.items():
+    _instrument(_replica.sync_engine, _label)
+
+
+def _pool_gauges(read):
+    def collect():
+        pools = [("sync", engine.pool), ("async", async_engine.pool)]
+        pools.extend((label, replica.pool) for label, replica in replica_engines.items())
+        pools.extend((label, replica.pool) for label, replica in async_replica_engines.items())
+        return {(label,): read(pool) for label, pool in pools}
+    return collect
+
+
+metrics.registry.register(metrics.GaugeCollector(
+    "db_pool_checked_out", "Connections currently checked out.", ("engine",),
+    _pool_gauges(lambda pool: pool.checkedout())))
+metrics.registry.register(metrics.GaugeCollector(
+    "db_pool_saturation", "Checked-out connections as a fraction of pool_size + max_overflow.", ("engine",),
+    _pool_gauges(lambda pool: pool.checkedout() / (POOL_SIZE + MAX_OVERFLOW))))
+
 Base = declarative_base()
 
+def dialect_insert(db, table):
+    """Return the dialect-specific insert() so callers can use ON CONFLICT clauses."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"ON CONFLICT is not supported for {dialect}")
+    return insert(table)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_read_db():
+    """Session for handlers that only read; see ``ReadSession``."""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_async_read_db():
+    """Async counterpart of ``get_read_db``."""
+    async with AsyncReadSessionLocal() as db:
+        yield db
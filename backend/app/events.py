@@ -0,0 +1,288 @@
+"""Push notifications for job applications and appointments (Server-Sent Events).
+
+Handlers call ``publish(db, user_ids, type, data)`` before committing; the
+event is delivered only if the transaction commits. ``broker`` fans events out
+to the ``GET /events`` streams of the users concerned.
+
+An idle subscriber costs one small ``asyncio.Queue`` and a suspended
+generator, so a worker can hold thousands of them. A client that stops
+reading has its stream closed once ``EVENTS_QUEUE_SIZE`` events are waiting;
+the client reconnects and refetches. A stream also ends when the access token
+it was opened with expires and when ``auth.invalidate_user`` runs for its user
+in this worker, so the client must fetch a fresh ticket to reconnect. Run
+uvicorn with ``--timeout-graceful-shutdown`` or it waits for every client to
+leave before stopping.
+
+``EVENTS_BACKEND`` picks how events reach the other workers:
+
+``memory`` (default)
+    In-process only; fine for a single worker.
+``postgres``
+    ``pg_notify`` in the publishing transaction and one ``LISTEN``
+    connection per worker, so every worker sees every event. Needs an
+    asyncpg ``ASYNC_DATABASE_URL``.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import orjson
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from . import auth, metrics
+from .database import async_engine
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory").lower()
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "64"))
+EVENTS_KEEPALIVE = float(os.getenv("EVENTS_KEEPALIVE", "15"))
+EVENTS_LISTEN_PING = float(os.getenv("EVENTS_LISTEN_PING", "30"))
+EVENTS_LISTEN_RETRY_MAX = 30.0
+PENDING_KEY = "pending_events"
+RETRY_FRAME = "retry: 5000\n\n"
+KEEPALIVE_FRAME = ": keepalive\n\n"
+
+logger = logging.getLogger(__name__)
+
+JOB_APPLICATION_CREATED = "job_application.created"
+JOB_APPLICATION_DELETED = "job_application.deleted"
+APPOINTMENT_CREATED = "appointment.created"
+APPOINTMENT_STATUS = "appointment.status"
+
+# (user ids, event type, JSON-serializable data)
+Message = Tuple[Tuple[int, ...], str, dict]
+
+
+def frame(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+class MemoryBackend:
+    """Delivers events to subscribers of this worker only, after commit."""
+
+    transactional = False
+
+    def __init__(self, broker: "Broker"):
+        self.broker = broker
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def publish(self, messages: List[Message]):
+        self.broker.dispatch_threadsafe(messages)
+
+
+class PostgresBackend:
+    """Fans events out to every worker through LISTEN/NOTIFY.
+
+    ``pg_notify`` runs on the publishing session's own connection just before
+    it commits; Postgres delivers the notifications only if the transaction
+    commits, so no second connection is needed. A notification that cannot
+    be sent (e.g. a payload over 8000 bytes) fails the commit.
+
+    The listening connection is taken from the async pool for the worker's
+    lifetime. A supervising task pings it every ``EVENTS_LISTEN_PING``
+    seconds and reconnects with backoff when it drops. Events sent while it
+    was down are lost, so every local stream is ended on reconnect and the
+    clients refetch.
+    """
+
+    channel = "app_events"
+    transactional = True
+
+    def __init__(self, broker: "Broker"):
+        self.broker = broker
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        delay, connected_before = 1.0, False
+        while True:
+            try:
+                async with async_engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver = raw.driver_connection
+                    lost = asyncio.Event()
+                    driver.add_termination_listener(lambda _: lost.set())
+                    await driver.add_listener(self.channel, self._on_notify)
+                    if connected_before:
+                        logger.info("Event listener reconnected")
+                        self.broker.disconnect_all()
+                    delay, connected_before = 1.0, True
+                    while not lost.is_set():
+                        try:
+                            await asyncio.wait_for(lost.wait(), EVENTS_LISTEN_PING)
+                        except asyncio.TimeoutError:
+                            # Straight on the driver: an SQLAlchemy execute would open a
+                            # transaction, which holds back notifications until it ends.
+                            await driver.fetchval("SELECT 1")
+                    raise ConnectionError("listening connection closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Event listener failed; retrying in %.0fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, EVENTS_LISTEN_RETRY_MAX)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        user_ids, event_type, data = orjson.loads(payload)
+        self.broker.dispatch([(tuple(user_ids), event_type, data)])
+
+    def publish_in_transaction(self, session: Session, messages: List[Message]):
+        for message in messages:
+            session.execute(text("SELECT pg_notify(:channel, :payload)"),
+                            {"channel": self.channel, "payload": orjson.dumps(message).decode()})
+
+
+BACKENDS = {"memory": MemoryBackend, "postgres": PostgresBackend}
+
+
+def _close(queue: asyncio.Queue):
+    while not queue.empty():
+        queue.get_nowait()
+    queue.put_nowait(None)
+
+
+class Broker:
+    def __init__(self, backend: str = EVENTS_BACKEND, queue_size: int = EVENTS_QUEUE_SIZE,
+                 keepalive: float = EVENTS_KEEPALIVE):
+        self.backend = BACKENDS[backend](self)
+        self.queue_size = queue_size
+        self.keepalive = keepalive
+        # Only touched from the event loop thread.
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await self.backend.start()
+
+    async def stop(self):
+        await self.backend.stop()
+
+    def subscriber_count(self) -> int:
+        return sum(len(queues) for queues in list(self._subscribers.values()))
+
+    def publish(self, messages: List[Message]):
+        """Send committed events through a non-transactional backend; safe from any thread."""
+        self.backend.publish(messages)
+
+    def dispatch_threadsafe(self, messages: List[Message]):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self.dispatch, messages)
+
+    def dispatch(self, messages: List[Message]):
+        for user_ids, event_type, data in messages:
+            targets = [queue for user_id in user_ids for queue in self._subscribers.get(user_id, ())]
+            if not targets:
+                continue
+            # Rendered once and shared by every subscriber.
+            payload = frame(event_type, data)
+            for queue in targets:
+                try:
+                    queue.put_nowait(payload)
+                except asyncio.QueueFull:
+                    # A stalled client: drop its backlog and end the stream.
+                    _close(queue)
+
+    def disconnect_threadsafe(self, user_id: int):
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self.disconnect, user_id)
+
+    def disconnect(self, user_id: int):
+        """End every open stream of ``user_id`` in this worker."""
+        for queue in self._subscribers.get(user_id, ()):
+            _close(queue)
+
+    def disconnect_all(self):
+        for queues in self._subscribers.values():
+            for queue in queues:
+                _close(queue)
+
+    async def stream(self, user_id: int, expires_at: Optional[float] = None):
+        """SSE frames for ``user_id`` until the client goes away or ``expires_at`` (epoch seconds)."""
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            yield RETRY_FRAME
+            while True:
+                timeout = self.keepalive
+                if expires_at is not None:
+                    remaining = expires_at - time.time()
+                    if remaining <= 0:
+                        return
+                    timeout = min(timeout, remaining)
+                try:
+                    payload = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    payload = KEEPALIVE_FRAME
+                if payload is None:
+                    return
+                yield payload
+        finally:
+            queues = self._subscribers.get(user_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[user_id]
+
+
+broker = Broker()
+
+auth.invalidation_listeners.append(broker.disconnect_threadsafe)
+
+metrics.registry.register(metrics.GaugeCollector(
+    "events_subscribers", "Open event streams in this worker.", (),
+    lambda: {(): broker.subscriber_count()}))
+
+
+def publish(db: Session, user_ids: Iterable[int], event_type: str, data: dict):
+    """Queue an event for ``user_ids``; it is sent only if ``db`` commits."""
+    db.info.setdefault(PENDING_KEY, []).append((tuple(set(user_ids)), event_type, data))
+
+
+@event.listens_for(Session, "before_commit")
+def _send_in_transaction(session):
+    # Also fires when a savepoint is released, which is fine: the NOTIFY
+    # still only goes out if the outer transaction commits.
+    if broker.backend.transactional:
+        pending = session.info.pop(PENDING_KEY, None)
+        if pending:
+            broker.backend.publish_in_transaction(session, pending)
+
+
+@event.listens_for(Session, "after_commit")
+def _send_pending(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        # The data is already committed; a failed notification must not fail the request.
+        try:
+            broker.publish(pending)
+        except Exception:
+            logger.exception("Could not publish %d events", len(pending))
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop(PENDING_KEY, None)
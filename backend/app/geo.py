@@ -0,0 +1,239 @@
+"""Coordinates, offline geocoding and radius search for caregivers.
+
+Users and addresses carry optional latitude/longitude. When a client does not
+send them, they are looked up by city (users) or town (addresses) in the
+``geocode`` table, which is loaded from a local CSV with ``name,latitude,longitude``
+columns::
+
+    python -m app.geo load places.csv
+    python -m app.geo backfill          # fill missing coordinates from the table
+
+Every located user also stores ``geo_cell``, the number of the
+``GRID_DEGREES`` x ``GRID_DEGREES`` cell containing it. A radius search reads
+only the cells overlapping the circle's bounding box, as one index range per
+grid row, and computes exact distances for those candidates alone.
+"""
+import argparse
+import csv
+import io
+import math
+import sys
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .database import dialect_insert
+
+GRID_DEGREES = 0.1
+LAT_CELLS = round(180 / GRID_DEGREES)
+LON_CELLS = round(360 / GRID_DEGREES)
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+MAX_RADIUS_KM = 200
+DEFAULT_BATCH_SIZE = 1000
+
+Location = Tuple[Optional[float], Optional[float]]
+NO_LOCATION: Location = (None, None)
+
+
+def normalize(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+def _lat_index(latitude: float) -> int:
+    return min(max(math.floor((latitude + 90) / GRID_DEGREES), 0), LAT_CELLS - 1)
+
+
+def _lon_index(longitude: float) -> int:
+    return math.floor((longitude + 180) / GRID_DEGREES) % LON_CELLS
+
+
+def cell_of(latitude: Optional[float], longitude: Optional[float]) -> Optional[int]:
+    if latitude is None or longitude is None:
+        return None
+    return _lat_index(latitude) * LON_CELLS + _lon_index(longitude)
+
+
+def user_columns(location: Location) -> dict:
+    latitude, longitude = location
+    return {"latitude": latitude, "longitude": longitude, "geo_cell": cell_of(latitude, longitude)}
+
+
+def address_columns(location: Location) -> dict:
+    latitude, longitude = location
+    return {"latitude": latitude, "longitude": longitude}
+
+
+def cell_ranges(latitude: float, longitude: float, radius_km: float) -> List[Tuple[int, int]]:
+    """Inclusive ``geo_cell`` ranges covering the circle's bounding box."""
+    dlat = radius_km / KM_PER_DEGREE
+    # Widest longitude span is at the band's edge furthest from the equator.
+    widest = min(abs(latitude) + dlat, 90.0)
+    cos_widest = math.cos(math.radians(widest))
+    dlon = 180.0 if cos_widest < 1e-9 else radius_km / (KM_PER_DEGREE * cos_widest)
+
+    if dlon >= 180:
+        columns = [(0, LON_CELLS - 1)]
+    else:
+        first, last = _lon_index(longitude - dlon), _lon_index(longitude + dlon)
+        columns = [(first, last)] if first <= last else [(0, last), (first, LON_CELLS - 1)]
+
+    ranges = []
+    for row in range(_lat_index(latitude - dlat), _lat_index(latitude + dlat) + 1):
+        for first, last in columns:
+            start, end = row * LON_CELLS + first, row * LON_CELLS + last
+            if ranges and ranges[-1][1] + 1 >= start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+    return sorted(ranges)
+
+
+def distances_km(latitude: float, longitude: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def geocode_many(db: Session, names: Iterable[Optional[str]]) -> Dict[str, Tuple[float, float]]:
+    """``{normalized name: (latitude, longitude)}`` for the names the table knows."""
+    keys = {normalize(name) for name in names if name}
+    if not keys:
+        return {}
+    rows = db.execute(
+        select(models.GEOCODE.name, models.GEOCODE.latitude, models.GEOCODE.longitude)
+        .where(models.GEOCODE.name.in_(keys))
+    )
+    return {name: (latitude, longitude) for name, latitude, longitude in rows}
+
+
+def locate(places: Dict[str, Tuple[float, float]], latitude: Optional[float], longitude: Optional[float],
+           place: Optional[str]) -> Location:
+    """Explicit coordinates win; otherwise look ``place`` up in ``places``."""
+    if latitude is not None and longitude is not None:
+        return latitude, longitude
+    if place:
+        return places.get(normalize(place), NO_LOCATION)
+    return NO_LOCATION
+
+
+def resolve(db: Session, latitude: Optional[float], longitude: Optional[float], place: Optional[str]) -> Location:
+    """``locate`` for a single record; only queries when it has to geocode."""
+    if latitude is not None and longitude is not None:
+        return latitude, longitude
+    return locate(geocode_many(db, [place]), None, None, place)
+
+
+def nearby_caregivers(db: Session, latitude: float, longitude: float, radius_km: float,
+                      caregiving_type: Optional[str] = None, limit: int = 50) -> List[Tuple[int, float]]:
+    """Caregivers within ``radius_km``, nearest first, as ``(caregiver_user_id, distance_km)``."""
+    query = select(models.USER.user_id, models.USER.latitude, models.USER.longitude) \
+        .join(models.CAREGIVER, models.CAREGIVER.caregiver_user_id == models.USER.user_id) \
+        .where(or_(*(models.USER.geo_cell.between(start, end)
+                     for start, end in cell_ranges(latitude, longitude, radius_km))))
+    if caregiving_type is not None:
+        query = query.where(models.CAREGIVER.caregiving_type == caregiving_type)
+    rows = db.execute(query).all()
+    if not rows:
+        return []
+
+    ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+    coordinates = np.array([(row[1], row[2]) for row in rows], dtype=np.float64)
+    distances = distances_km(latitude, longitude, coordinates[:, 0], coordinates[:, 1])
+    inside = np.flatnonzero(distances <= radius_km)
+    if len(inside) > limit:
+        inside = inside[np.argpartition(distances[inside], limit - 1)[:limit]]
+    # Ties broken by id so results are stable.
+    order = inside[np.lexsort((ids[inside], distances[inside]))]
+    return [(int(ids[index]), round(float(distances[index]), 3)) for index in order]
+
+
+def read_places(stream) -> Iterable[dict]:
+    for record in csv.DictReader(stream):
+        name = (record.get("name") or "").strip()
+        if not name:
+            continue
+        latitude, longitude = float(record["latitude"]), float(record["longitude"])
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            raise ValueError(f"Coordinates out of range for {name!r}")
+        yield {"name": normalize(name), "latitude": latitude, "longitude": longitude}
+
+
+def load_places(db: Session, places: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """Upsert places into the geocode table; later rows win for duplicate names."""
+    table = models.GEOCODE.__table__
+    count = 0
+    batch = {}
+    for place in places:
+        batch[place["name"]] = place
+        if len(batch) == batch_size:
+            count += _upsert_places(db, table, list(batch.values()))
+            batch = {}
+    if batch:
+        count += _upsert_places(db, table, list(batch.values()))
+    db.commit()
+    return count
+
+
+def _upsert_places(db: Session, table, rows: List[dict]) -> int:
+    statement = dialect_insert(db, table)
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.name],
+        set_={"latitude": statement.excluded.latitude, "longitude": statement.excluded.longitude},
+    ), rows)
+    return len(rows)
+
+
+def backfill(db: Session) -> Dict[str, int]:
+    """Geocode users and addresses that have a city/town but no coordinates.
+
+    One UPDATE per distinct place name, so it stays cheap on large tables.
+    """
+    counts = {}
+    targets = (
+        (models.USER, models.USER.city, user_columns),
+        (models.ADDRESS, models.ADDRESS.town, address_columns),
+    )
+    for model, column, columns in targets:
+        names = db.scalars(select(column).distinct().where(model.latitude.is_(None), column.isnot(None))).all()
+        places = geocode_many(db, names)
+        updated = 0
+        for name in names:
+            location = locate(places, None, None, name)
+            if location == NO_LOCATION:
+                continue
+            updated += db.execute(
+                update(model).where(column == name, model.latitude.is_(None)).values(**columns(location))
+            ).rowcount
+        counts[model.__tablename__] = updated
+    db.commit()
+    return counts
+
+
+def main(argv=None):
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Load the offline geocoding table and backfill coordinates.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    load = commands.add_parser("load", help="upsert places from a CSV with name,latitude,longitude")
+    load.add_argument("path", help="input file, or - for stdin")
+    load.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    commands.add_parser("backfill", help="geocode users and addresses that have no coordinates")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        if args.command == "load":
+            stream = sys.stdin if args.path == "-" else io.open(args.path, newline="", encoding="utf-8")
+            with stream:
+                print(f"loaded {load_places(db, read_places(stream), args.batch_size)} places")
+        else:
+            for table, count in backfill(db).items():
+                print(f"{table}: {count} rows located")
+
+
+if __name__ == "__main__":
+    main()
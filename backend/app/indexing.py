@@ -0,0 +1,89 @@
+"""Shared loading for the per-process caregiver indexes.
+
+The search index and the matching features both keep an in-memory copy of
+every caregiver. Each is built lazily from the database, kept current by
+upsert() in the worker that handled a write, and rebuilt whenever the
+``caregivers`` version (see versioning.py) differs from the one it was built
+at, which picks up writes from other workers and from the onboarding CLI.
+"""
+import asyncio
+import threading
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models, versioning
+from .database import ReadSessionLocal
+
+
+class CaregiverIndex:
+    """Base for in-memory caregiver indexes.
+
+    Subclasses create their empty structures in ``_reset()`` and add one
+    caregiver in ``_add(caregiver_user_id, doc)``; ``doc`` holds the
+    caregiving type, city, gender and hourly rate.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version: Optional[int] = None
+        self._reset()
+
+    def _reset(self):
+        raise NotImplementedError
+
+    def _add(self, caregiver_user_id: int, doc: dict):
+        raise NotImplementedError
+
+    @property
+    def loaded(self) -> bool:
+        return self._version is not None
+
+    def ensure_loaded(self, db: Session):
+        """Build the index from ``db``, or rebuild it if caregivers changed since."""
+        if self._version == versioning.version_of(db, versioning.CAREGIVERS):
+            return
+        with self._lock:
+            # Read the version before the rows: bumps commit after the data,
+            # so the rows are at least as new as the version recorded.
+            version = versioning.version_of(db, versioning.CAREGIVERS)
+            if self._version == version:
+                return
+            self._reset()
+            rows = db.query(
+                models.CAREGIVER.caregiver_user_id,
+                models.CAREGIVER.caregiving_type,
+                models.USER.city,
+                models.CAREGIVER.gender,
+                models.CAREGIVER.hourly_rate,
+            ).join(models.USER, models.USER.user_id == models.CAREGIVER.caregiver_user_id)
+            for row in rows:
+                self._add(row.caregiver_user_id, {
+                    "caregiving_type": row.caregiving_type,
+                    "city": row.city,
+                    "gender": row.gender,
+                    "hourly_rate": row.hourly_rate,
+                })
+            self._version = version
+
+    async def ensure_loaded_async(self, db: AsyncSession):
+        """``ensure_loaded`` for async handlers.
+
+        The version is checked on the handler's session. A (re)build runs on a
+        worker thread with its own read session: the lock is a thread lock and
+        must not be held across awaits. run_in_executor, unlike to_thread, does
+        not copy the request's context, so the rebuild is not counted against
+        the query budget of whichever request happened to trigger it.
+        """
+        if self._version != await versioning.version_of_async(db, versioning.CAREGIVERS):
+            await asyncio.get_running_loop().run_in_executor(None, self._load_in_own_session)
+
+    def _load_in_own_session(self):
+        with ReadSessionLocal() as db:
+            self.ensure_loaded(db)
+
+    def clear(self):
+        with self._lock:
+            self._version = None
+            self._reset()
@@ -1,18 +1,16 @@
 from fastapi import FastAPI, Response
 from starlette.responses import JSONResponse
 
-from . import models
-from .database import get_db, engine
+from . import models, metrics, querybudget, startup
+from .database import get_async_db, track_queries
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import user, caregivers, members, appointments, jobs, job_applications
+from .routers import user, caregivers, members, appointments, jobs, job_applications, onboarding, reports, events
 
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 from . import schemas, auth
 
-models.Base.metadata.create_all(bind=engine)
-
 # app = FastAPI(title="Caregiver Platform API", version="1.0.0")
 #
 # app.add_middleware(
@@ -23,7 +21,8 @@ models.Base.metadata.create_all(bind=engine)
 #     allow_headers=["*"],
 # )
 
-app = FastAPI(title="Caregiver Platform API")
+# Tables are created by `python -m app.migrate upgrade`, not at import time.
+app = FastAPI(title="Caregiver Platform API", lifespan=startup.lifespan)
 
 # CORS configuration
 origins = [
@@ -42,6 +41,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware, track_queries=track_queries, check_budget=querybudget.check,
+                   untimed_routes={"/events"})
 
 app.include_router(caregivers.router, tags=["caregivers"])
 app.include_router(members.router, tags=["members"])
@@ -49,6 +50,9 @@ app.include_router(jobs.router, tags=["jobs"])
 app.include_router(appointments.router, tags=["appointments"])
 app.include_router(user.router, tags=["user"])
 app.include_router(job_applications.router, tags=["job_applications"])
+app.include_router(onboarding.router, tags=["onboarding"])
+app.include_router(reports.router, tags=["reports"])
+app.include_router(events.router, tags=["events"])
 
 
 @app.head("/", status_code=status.HTTP_200_OK)
@@ -67,27 +71,50 @@ async def head_health_check(response: Response):
 async def health_check():
     return JSONResponse({"status": "ok"})
 
-@app.post("/token", response_model=schemas.Token)
-async def login_for_access_token(login_data: schemas.UserLogin, db: Session = Depends(get_db)):
-    cur_user = db.query(models.USER).filter(models.USER.email == login_data.email).first()
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"principal": auth.principal_cache.stats()}
+
+@app.get("/stats/password_hashing")
+async def password_hashing_stats():
+    return auth.password_pool.stats()
+
+metrics.registry.register(metrics.GaugeCollector(
+    "principal_cache", "Principal cache counters and size.", ("stat",),
+    lambda: {(key,): value for key, value in auth.principal_cache.stats().items()}))
+metrics.registry.register(metrics.GaugeCollector(
+    "password_hashing", "Password hashing pool state.", ("stat",),
+    lambda: {(key,): value for key, value in auth.password_pool.stats().items()}))
 
-    if not cur_user or not auth.verify_password(login_data.password, cur_user.password):
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.post("/token", response_model=schemas.Token)
+async def login_for_access_token(login_data: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
+    row = await auth.get_user_with_role(db, models.USER.email == login_data.email)
+    cur_user, caregiver, member = row if row else (None, None, None)
+
+    valid, new_hash = (False, None)
+    if cur_user:
+        valid, new_hash = await auth.verify_and_update_password(login_data.password, cur_user.password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        cur_user.password = new_hash
+        await db.commit()
 
-    # Determine user type
-    caregiver = db.query(models.CAREGIVER).filter(models.CAREGIVER.caregiver_user_id == cur_user.user_id).first()
-    member = db.query(models.MEMBER).filter(models.MEMBER.member_user_id == cur_user.user_id).first()
-
-    user_type = "caregiver" if caregiver else "member" if member else "unknown"
+    user_type = auth.user_type_of(caregiver, member)
 
     # Create access token
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
-        data={"sub": cur_user.email, "user_type": user_type},
+        data={"sub": cur_user.email, "user_type": user_type, "user_id": cur_user.user_id},
         expires_delta=access_token_expires
     )
 
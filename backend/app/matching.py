@@ -0,0 +1,121 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .indexing import CaregiverIndex
+
+TYPE_WEIGHT = 3.0
+CITY_WEIGHT = 2.0
+RATE_WEIGHT = 1.0
+
+UNKNOWN = -1
+
+
+class CaregiverFeatures(CaregiverIndex):
+    """Columnar, per-process copy of the caregiver attributes used for matching.
+
+    Each caregiver owns one row in a set of NumPy arrays; categorical values
+    are stored as integer codes so a job can be scored against every
+    caregiver with a handful of vectorized comparisons. Rows are updated in
+    place when a profile changes, and the arrays grow by doubling.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._capacity = capacity
+        super().__init__()
+
+    def _reset(self):
+        capacity = self._capacity
+        self._size = 0
+        self._rows: Dict[int, int] = {}
+        self._codes: Dict[str, Dict[str, int]] = {"caregiving_type": {}, "city": {}}
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.type_codes = np.full(capacity, UNKNOWN, dtype=np.int32)
+        self.city_codes = np.full(capacity, UNKNOWN, dtype=np.int32)
+        self.rates = np.full(capacity, np.nan, dtype=np.float64)
+        self.active = np.zeros(capacity, dtype=bool)
+
+    def upsert(self, caregiver_user_id: int, **fields):
+        with self._lock:
+            if not self.loaded:
+                return
+            self._add(caregiver_user_id, fields)
+
+    def remove(self, caregiver_user_id: int):
+        with self._lock:
+            row = self._rows.get(caregiver_user_id)
+            if row is not None:
+                self.active[row] = False
+
+    def _code(self, field: str, value: Optional[str], create: bool = True) -> int:
+        if value is None:
+            return UNKNOWN
+        codes = self._codes[field]
+        if value not in codes:
+            if not create:
+                return UNKNOWN
+            codes[value] = len(codes)
+        return codes[value]
+
+    def _grow(self):
+        capacity = len(self.ids) * 2
+        fills = {"ids": 0, "type_codes": UNKNOWN, "city_codes": UNKNOWN, "rates": np.nan, "active": False}
+        for name, fill in fills.items():
+            old = getattr(self, name)
+            new = np.full(capacity, fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _add(self, caregiver_user_id: int, fields: dict):
+        row = self._rows.get(caregiver_user_id)
+        if row is None:
+            if self._size == len(self.ids):
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._rows[caregiver_user_id] = row
+            self.ids[row] = caregiver_user_id
+        if "caregiving_type" in fields:
+            self.type_codes[row] = self._code("caregiving_type", fields["caregiving_type"])
+        if "city" in fields:
+            self.city_codes[row] = self._code("city", fields["city"])
+        if "hourly_rate" in fields:
+            rate = fields["hourly_rate"]
+            self.rates[row] = np.nan if rate is None else rate
+        self.active[row] = True
+
+    def rank(self, caregiving_type: Optional[str], city: Optional[str], limit: int = 10) -> List[Tuple[int, float]]:
+        with self._lock:
+            n = self._size
+            if n == 0:
+                return []
+            active = self.active[:n]
+            rates = self.rates[:n]
+
+            scores = np.zeros(n, dtype=np.float64)
+            type_code = self._code("caregiving_type", caregiving_type, create=False)
+            if type_code != UNKNOWN:
+                scores += TYPE_WEIGHT * (self.type_codes[:n] == type_code)
+            city_code = self._code("city", city, create=False)
+            if city_code != UNKNOWN:
+                scores += CITY_WEIGHT * (self.city_codes[:n] == city_code)
+
+            # Cheaper caregivers score higher; rates are min-max scaled over the
+            # active population and missing rates contribute nothing.
+            known = active & ~np.isnan(rates)
+            if known.any():
+                low = rates[known].min()
+                spread = rates[known].max() - low
+                rate_score = np.ones(n) if spread == 0 else 1.0 - (rates - low) / spread
+                scores += RATE_WEIGHT * np.where(known, rate_score, 0.0)
+
+            scores[~active] = -np.inf
+            k = min(limit, int(active.sum()))
+            if k == 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.lexsort((self.ids[top], -scores[top]))]
+            return [(int(self.ids[row]), float(scores[row])) for row in top]
+
+
+caregiver_features = CaregiverFeatures()
@@ -0,0 +1,192 @@
+"""Minimal Prometheus text-format metrics.
+
+Metrics live in process memory, so each worker exposes its own numbers on
+``/metrics``; scrape every worker (or run one per pod). Observations take a
+single lock and a bisect, cheap enough to leave on in production.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in items)
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # Per label set: [per-bucket counts (not cumulative), sum, count]
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items()]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = 'le="' + _number(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class GaugeCollector:
+    """Gauges computed at scrape time from a callback returning ``{labels: value}``."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str],
+                 collect: Callable[[], Dict[tuple, float]]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        lines.extend(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                     for labels, value in self.collect().items())
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_DURATION = registry.register(Histogram(
+    "http_request_duration_seconds", "Request duration by route template and status code.",
+    ("method", "route", "status")))
+REQUEST_QUERIES = registry.register(Histogram(
+    "http_request_sql_queries", "SQL statements executed per request.",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS))
+REQUEST_SQL_TIME = registry.register(Histogram(
+    "http_request_sql_seconds", "Time spent executing SQL per request.",
+    ("method", "route")))
+SQL_QUERIES = registry.register(Counter(
+    "db_queries_total", "SQL statements executed.", ("engine",)))
+SQL_TIME = registry.register(Counter(
+    "db_query_seconds_total", "Time spent executing SQL statements.", ("engine",)))
+POOL_CHECKOUT_WAIT = registry.register(Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.", ("engine",),
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0)))
+
+
+def _route_label(scope) -> str:
+    # Starlette's router stores the matched route in the (shared) scope.
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency and SQL usage per route template.
+
+    Labels use the route template (``/jobs/{job_id}``), never the raw path,
+    so the number of series stays bounded. Routes in ``untimed_routes`` are
+    kept out of ``REQUEST_DURATION``: a stream such as ``/events`` stays open
+    for as long as the client does and would swamp the latency buckets.
+    """
+
+    def __init__(self, app, track_queries, check_budget=None, untimed_routes=()):
+        self.app = app
+        self.track_queries = track_queries
+        self.check_budget = check_budget
+        self.untimed_routes = frozenset(untimed_routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        with self.track_queries() as stats:
+            started = time.perf_counter()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                elapsed = time.perf_counter() - started
+                method, route = scope["method"], _route_label(scope)
+                if route not in self.untimed_routes:
+                    REQUEST_DURATION.observe(elapsed, method, route, status_code)
+                REQUEST_QUERIES.observe(stats.count, method, route)
+                REQUEST_SQL_TIME.observe(stats.seconds, method, route)
+            if self.check_budget is not None:
+                self.check_budget(stats, method, route)
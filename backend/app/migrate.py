@@ -0,0 +1,153 @@
+"""Schema management, run once per deploy instead of on every worker boot.
+
+Usage::
+
+    python -m app.migrate upgrade   # create missing tables and record SCHEMA_VERSION
+    python -m app.migrate check     # exit 1 unless the database is at SCHEMA_VERSION
+
+Bump ``SCHEMA_VERSION`` whenever ``models`` change so that workers started
+against an out-of-date database refuse to serve instead of failing per request.
+``create_all`` only creates missing tables (and their indexes), so changes to
+existing tables also need a step in ``MIGRATIONS``. A fresh database is
+created at the latest version directly; steps only run against older ones.
+"""
+import argparse
+import os
+import sys
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn
+
+from . import models
+from .database import dialect_insert
+
+SCHEMA_VERSION = 2
+_ROW_ID = 1
+# Databases created by the old import-time create_all have the baseline tables,
+# none of the indexes added since, and no version row.
+BASELINE_VERSION = 0
+
+
+class SchemaMismatch(RuntimeError):
+    pass
+
+
+def current_version(engine: Engine) -> Optional[int]:
+    """Recorded schema version, or None if the database was never migrated."""
+    # Connection errors propagate; only a failing SELECT means "no version table".
+    with engine.connect() as conn:
+        try:
+            return conn.execute(select(models.SCHEMA_VERSION.version)
+                                .where(models.SCHEMA_VERSION.id == _ROW_ID)).scalar()
+        except (OperationalError, ProgrammingError):
+            return None
+
+
+def check(engine: Engine):
+    """One indexed SELECT; raises SchemaMismatch unless the database is at SCHEMA_VERSION."""
+    version = current_version(engine)
+    if version != SCHEMA_VERSION:
+        raise SchemaMismatch(
+            f"Database schema is at version {version}, this build expects {SCHEMA_VERSION}; "
+            f"run `python -m app.migrate upgrade`")
+
+
+def _add_columns(conn, model, *names: str):
+    """Add the columns that are not there yet, so a re-run step is a no-op."""
+    table = model.__table__
+    quoted = conn.dialect.identifier_preparer.quote(table.name)
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name in existing:
+            continue
+        column = CreateColumn(table.c[name]).compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE {quoted} ADD COLUMN {column}"))
+
+
+def _create_indexes(conn):
+    """Create model indexes missing from existing tables.
+
+    Indexes on columns a later step adds are left to that step.
+    """
+    inspector = inspect(conn)
+    for table in models.Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for index in table.indexes:
+            if {column.name for column in index.columns} <= columns:
+                index.create(conn, checkfirst=True)
+
+
+def _add_locations(conn):
+    _add_columns(conn, models.USER, "latitude", "longitude", "geo_cell")
+    _add_columns(conn, models.ADDRESS, "latitude", "longitude")
+    next(index for index in models.USER.__table__.indexes
+         if index.name == "ix_user_geo_cell").create(conn, checkfirst=True)
+
+
+# Version reached -> step taking the previous version there.
+MIGRATIONS = {
+    1: _create_indexes,
+    2: _add_locations,
+}
+
+
+def _stamp(conn, version: int):
+    table = models.SCHEMA_VERSION.__table__
+    now = datetime.utcnow()
+    statement = dialect_insert(Session(bind=conn), table).values(id=_ROW_ID, version=version, applied_at=now)
+    conn.execute(statement.on_conflict_do_update(
+        index_elements=[table.c.id],
+        set_={"version": version, "applied_at": now},
+    ))
+
+
+def upgrade(engine: Engine) -> int:
+    version = current_version(engine)
+    if version is None and inspect(engine).has_table(models.USER.__tablename__):
+        version = BASELINE_VERSION
+    # New tables first (including schema_version itself); existing ones are left alone.
+    models.Base.metadata.create_all(bind=engine)
+    if version is not None:
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            with engine.begin() as conn:
+                MIGRATIONS[target](conn)
+                _stamp(conn, target)
+    with engine.begin() as conn:
+        # Also repairs databases stamped by releases whose upgrade skipped indexes.
+        _create_indexes(conn)
+        _stamp(conn, SCHEMA_VERSION)
+    return SCHEMA_VERSION
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create or check the database schema.")
+    parser.add_argument("command", choices=["upgrade", "check"])
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set and --database-url was not given")
+    engine = create_engine(args.database_url)
+    try:
+        if args.command == "upgrade":
+            print(f"Schema at version {upgrade(engine)}", file=sys.stderr)
+        else:
+            try:
+                check(engine)
+            except SchemaMismatch as exc:
+                print(exc, file=sys.stderr)
+                sys.exit(1)
+            print(f"Schema at version {SCHEMA_VERSION}", file=sys.stderr)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
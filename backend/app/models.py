@@ -1,19 +1,26 @@
-from sqlalchemy import Column, Integer, String, Float, Date, Time, Text, ForeignKey, func
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Time, Text, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from .database import Base
 
 
 class USER(Base):
     __tablename__ = "USER"
+    __table_args__ = (
+        # Covers the grid-cell range scans of geo.nearby_caregivers.
+        Index("ix_user_geo_cell", "geo_cell", "latitude", "longitude"),
+    )
 
     user_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     email = Column(String(255), unique=True, index=True, nullable=False)
     given_name = Column(String(100), nullable=False)
     surname = Column(String(100), nullable=False)
-    city = Column(String(100))
+    city = Column(String(100), index=True)
     phone_number = Column(String(20))
     profile_description = Column(Text)
     password = Column(String(255), nullable=False)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    geo_cell = Column(Integer)
 
     caregiver = relationship("CAREGIVER", back_populates="user", uselist=False, cascade="all, delete-orphan")
     member = relationship("MEMBER", back_populates="user", uselist=False, cascade="all, delete-orphan")
@@ -21,12 +28,16 @@ class USER(Base):
 
 class CAREGIVER(Base):
     __tablename__ = "caregiver"
+    __table_args__ = (
+        Index("ix_caregiver_caregiving_type_user_id", "caregiving_type", "caregiver_user_id"),
+        Index("ix_caregiver_gender_user_id", "gender", "caregiver_user_id"),
+    )
 
     caregiver_user_id = Column(Integer, ForeignKey("USER.user_id", ondelete="CASCADE"), primary_key=True)
     photo = Column(String(500))
     gender = Column(String(20))
     caregiving_type = Column(String(100))
-    hourly_rate = Column(Float)
+    hourly_rate = Column(Float, index=True)
 
     user = relationship("USER", back_populates="caregiver")
     job_applications = relationship("JOB_APPLICATION", back_populates="caregiver", cascade="all, delete-orphan")
@@ -53,15 +64,21 @@ class ADDRESS(Base):
     house_number = Column(String(20))
     street = Column(String(255))
     town = Column(String(100))
+    latitude = Column(Float)
+    longitude = Column(Float)
 
     member = relationship("MEMBER", back_populates="addresses")
 
 
 class JOB(Base):
     __tablename__ = "job"
+    __table_args__ = (
+        Index("ix_job_required_caregiving_type_date_posted", "required_caregiving_type", "date_posted"),
+        Index("ix_job_date_posted_job_id", "date_posted", "job_id"),
+    )
 
     job_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    member_user_id = Column(Integer, ForeignKey("member.member_user_id", ondelete="CASCADE"))
+    member_user_id = Column(Integer, ForeignKey("member.member_user_id", ondelete="CASCADE"), index=True)
     required_caregiving_type = Column(String(100))
     other_requirements = Column(Text)
     date_posted = Column(Date, server_default=func.current_date())
@@ -83,6 +100,9 @@ class JOB_APPLICATION(Base):
 
 class APPOINTMENT(Base):
     __tablename__ = "appointment"
+    __table_args__ = (
+        Index("ix_appointment_caregiver_date", "caregiver_user_id", "appointment_date"),
+    )
 
     appointment_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     caregiver_user_id = Column(Integer, ForeignKey("caregiver.caregiver_user_id", ondelete="CASCADE"))
@@ -93,4 +113,26 @@ class APPOINTMENT(Base):
     status = Column(String(100), default="pending")
 
     caregiver = relationship("CAREGIVER", back_populates="appointments")
-    member = relationship("MEMBER", back_populates="appointments")
\ No newline at end of file
+    member = relationship("MEMBER", back_populates="appointments")
+
+class RESOURCE_VERSION(Base):
+    __tablename__ = "resource_version"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
+
+class SCHEMA_VERSION(Base):
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime, nullable=False)
+
+
+class GEOCODE(Base):
+    __tablename__ = "geocode"
+
+    name = Column(String(100), primary_key=True)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
@@ -0,0 +1,209 @@
+"""Bulk onboarding of caregivers and members.
+
+Usage::
+
+    python -m app.onboarding caregivers agency.csv
+    python -m app.onboarding members families.ndjson --batch-size 1000
+"""
+import argparse
+import codecs
+import csv
+import io
+import json
+import sys
+import time
+from typing import Iterable, Iterator, List, Optional
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import geo, models, registration, schemas, auth, versioning
+
+ROLES = {
+    "caregivers": schemas.CaregiverRegister,
+    "members": schemas.MemberRegister,
+}
+COLLECTIONS = {
+    "caregivers": versioning.CAREGIVERS,
+    "members": versioning.MEMBERS,
+}
+DEFAULT_BATCH_SIZE = 500
+
+
+def read_records(stream, fmt: str) -> Iterator[dict]:
+    """Yield raw records from a CSV or NDJSON text stream.
+
+    Malformed NDJSON lines are yielded as-is so they fail validation per row.
+    """
+    if fmt == "csv":
+        for record in csv.DictReader(stream):
+            yield {key: (value if value != "" else None) for key, value in record.items()}
+    elif fmt == "ndjson":
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield line
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def detect_format(filename: Optional[str]) -> str:
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+def ensure_utf8(binary, chunk_size: int = 1 << 16):
+    """Raise UnicodeDecodeError unless the rest of ``binary`` is UTF-8, then rewind it.
+
+    Records are decoded lazily and every batch commits, so a bad byte found
+    while importing would leave the rows before it imported.
+    """
+    start = binary.tell()
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for chunk in iter(lambda: binary.read(chunk_size), b""):
+        decoder.decode(chunk)
+    decoder.decode(b"", final=True)
+    binary.seek(start)
+
+
+def batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert_batch(db: Session, role: str, valid: list) -> dict:
+    """Bulk insert validated rows, returning ``{email: user_id}``."""
+    user_ids = {}
+    places = geo.geocode_many(db, [name for _, data, _ in valid for name in (data.city, getattr(data, "town", None))])
+    rows = db.execute(
+        insert(models.USER).returning(models.USER.user_id, models.USER.email),
+        [registration.user_row(data, password_hash, registration.user_location(places, role, data))
+         for _, data, password_hash in valid]
+    )
+    for user_id, email in rows:
+        user_ids[email] = user_id
+
+    if role == "caregivers":
+        db.execute(insert(models.CAREGIVER), [
+            dict(registration.caregiver_row(data), caregiver_user_id=user_ids[data.email]) for _, data, _ in valid
+        ])
+    else:
+        db.execute(insert(models.MEMBER), [
+            dict(registration.member_row(data), member_user_id=user_ids[data.email]) for _, data, _ in valid
+        ])
+        db.execute(insert(models.ADDRESS), [
+            dict(registration.address_row(data, registration.address_location(places, data)),
+                 member_user_id=user_ids[data.email])
+            for _, data, _ in valid
+        ])
+    return user_ids
+
+
+def import_records(db: Session, role: str, records: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE) -> List[dict]:
+    """Validate, hash and insert registrations in batches.
+
+    Each batch is one transaction. Rows that fail validation or clash with an
+    existing email are reported individually and do not abort the batch.
+    Returns one result dict per input row.
+    """
+    schema = ROLES[role]
+    results = []
+    for batch in batches(enumerate(records, start=1), batch_size):
+        candidates = []
+        for row_number, record in batch:
+            try:
+                candidates.append((row_number, schema.model_validate(record)))
+            except ValidationError as exc:
+                email = record.get("email") if isinstance(record, dict) else None
+                results.append({"row": row_number, "email": email, "user_id": None,
+                                "error": "; ".join(err["msg"] for err in exc.errors())})
+
+        emails = [data.email for _, data in candidates]
+        taken = set(db.scalars(select(models.USER.email).where(models.USER.email.in_(emails)))) if emails else set()
+        unique = []
+        for row_number, data in candidates:
+            if data.email in taken:
+                results.append({"row": row_number, "email": data.email, "user_id": None,
+                                "error": "Email already registered"})
+            else:
+                taken.add(data.email)
+                unique.append((row_number, data))
+
+        hashes = auth.get_password_hashes([data.password for _, data in unique])
+        valid = [(row_number, data, password_hash) for (row_number, data), password_hash in zip(unique, hashes)]
+        if not valid:
+            continue
+
+        try:
+            user_ids = _insert_batch(db, role, valid)
+            versioning.bump(db, COLLECTIONS[role])
+            db.commit()
+        except IntegrityError:
+            # Lost a race with a concurrent registration; retry row by row so
+            # only the conflicting rows are rejected.
+            db.rollback()
+            user_ids = {}
+            for item in valid:
+                try:
+                    with db.begin_nested():
+                        user_ids.update(_insert_batch(db, role, [item]))
+                except IntegrityError:
+                    results.append({"row": item[0], "email": item[1].email, "user_id": None,
+                                    "error": "Email already registered"})
+            versioning.bump(db, COLLECTIONS[role])
+            db.commit()
+
+        for row_number, data, _ in valid:
+            if data.email not in user_ids:
+                continue
+            results.append({"row": row_number, "email": data.email, "user_id": user_ids[data.email], "error": None})
+            if role == "caregivers":
+                registration.sync_caregiver_indexes(user_ids[data.email], data.city, registration.caregiver_row(data))
+
+    results.sort(key=lambda result: result["row"])
+    return results
+
+
+def summarize(results: List[dict]) -> dict:
+    created = sum(1 for result in results if result["error"] is None)
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+def main(argv=None):
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Bulk onboard caregivers or members from CSV/NDJSON.")
+    parser.add_argument("role", choices=sorted(ROLES))
+    parser.add_argument("path", help="input file, or - for stdin")
+    parser.add_argument("--format", choices=["csv", "ndjson"])
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or detect_format(args.path)
+    stream = sys.stdin if args.path == "-" else io.open(args.path, newline="", encoding="utf-8")
+    started = time.perf_counter()
+    with stream, SessionLocal() as db:
+        summary = summarize(import_records(db, args.role, read_records(stream, fmt), args.batch_size))
+    elapsed = time.perf_counter() - started
+
+    for result in summary["results"]:
+        if result["error"]:
+            print(f"row {result['row']} ({result['email']}): {result['error']}", file=sys.stderr)
+    print(f"created {summary['created']}, failed {summary['failed']} in {elapsed:.1f}s")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""Per-route SQL statement budgets.
+
+Declare a budget on a route with ``dependencies=[query_budget(3)]``. The
+count covers the whole request, including authentication and ETag lookups.
+When a request goes over its budget, it is logged, counted in
+``http_request_query_budget_exceeded_total`` and recorded on the request's
+``QueryStats.over_budget``. The response has been sent by then, so callers
+that want N+1 regressions to fail (tests, ``python -m app.benchmark
+budgets``) wrap requests in ``track_queries()`` and check that list.
+"""
+import logging
+
+from fastapi import Depends
+
+from . import metrics
+from .database import current_query_stats
+
+logger = logging.getLogger(__name__)
+
+BUDGET_EXCEEDED = metrics.registry.register(metrics.Counter(
+    "http_request_query_budget_exceeded_total", "Requests that ran more SQL statements than their route allows.",
+    ("method", "route")))
+
+
+def query_budget(max_queries: int):
+    def declare():
+        stats = current_query_stats()
+        if stats is not None:
+            stats.budget = max_queries
+    return Depends(declare)
+
+
+def check(stats, method: str, route: str):
+    if stats.budget is None or stats.count <= stats.budget:
+        return
+    BUDGET_EXCEEDED.inc(method, route)
+    message = f"{method} {route} ran {stats.count} SQL statements, budget is {stats.budget}"
+    stats.over_budget.append(message)
+    logger.warning(message)
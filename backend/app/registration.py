@@ -0,0 +1,76 @@
+"""Row builders shared by the registration endpoints and bulk onboarding.
+
+Each builder turns a validated registration payload into the column dict
+for one table, so ``POST /caregivers``, ``POST /members`` and
+``python -m app.onboarding`` store exactly the same values.
+"""
+from typing import Optional
+
+from . import geo
+from .matching import caregiver_features
+from .search_index import caregiver_index
+
+
+def user_row(data, password_hash: str, location: geo.Location = geo.NO_LOCATION) -> dict:
+    return {
+        'email': data.email,
+        'given_name': data.given_name,
+        'surname': data.surname,
+        'city': data.city,
+        'phone_number': data.phone_number,
+        'profile_description': data.profile_description,
+        'password': password_hash,
+        **geo.user_columns(location)
+    }
+
+
+def caregiver_row(data) -> dict:
+    return {
+        'photo': data.photo,
+        'gender': data.gender,
+        'caregiving_type': data.caregiving_type if data.caregiving_type else None,
+        'hourly_rate': data.hourly_rate
+    }
+
+
+def member_row(data) -> dict:
+    return {
+        'house_rules': data.house_rules,
+        'dependent_description': data.dependent_description
+    }
+
+
+def address_row(data, location: geo.Location = geo.NO_LOCATION) -> dict:
+    return {
+        'house_number': data.house_number,
+        'street': data.street,
+        'town': data.town,
+        **geo.address_columns(location)
+    }
+
+
+def user_location(places: dict, role: str, data) -> geo.Location:
+    # A member's coordinates belong to the address; the user is placed by city.
+    if role == "caregivers":
+        return geo.locate(places, data.latitude, data.longitude, data.city)
+    return geo.locate(places, None, None, data.city)
+
+
+def address_location(places: dict, data) -> geo.Location:
+    return geo.locate(places, data.latitude, data.longitude, data.town)
+
+
+def sync_caregiver_indexes(caregiver_user_id: int, city: Optional[str], profile: dict):
+    caregiver_index.upsert(
+        caregiver_user_id,
+        caregiving_type=profile['caregiving_type'],
+        city=city,
+        gender=profile['gender'],
+        hourly_rate=profile['hourly_rate']
+    )
+    caregiver_features.upsert(
+        caregiver_user_id,
+        caregiving_type=profile['caregiving_type'],
+        city=city,
+        hourly_rate=profile['hourly_rate']
+    )
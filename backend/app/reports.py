@@ -0,0 +1,118 @@
+"""Earnings and billing reports over appointments.
+
+Usage::
+
+    python -m app.reports caregivers --period month --from 2026-01-01 > earnings.csv
+    python -m app.reports members --period week --status accepted
+
+Amounts are ``work_hours * hourly_rate`` at the caregiver's current rate.
+Each report is a single GROUP BY query; weeks (starting Monday) and months are
+bucketed by the database, so only the final rows ever reach Python.
+"""
+import argparse
+import csv
+import io
+import sys
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import Date, func, literal_column, select
+from sqlalchemy.orm import Session
+
+from . import models
+
+GROUPS = {
+    "caregivers": models.APPOINTMENT.caregiver_user_id,
+    "members": models.APPOINTMENT.member_user_id,
+    "caregiving_types": models.CAREGIVER.caregiving_type,
+}
+GROUP_FIELDS = {
+    "caregivers": "caregiver_user_id",
+    "members": "member_user_id",
+    "caregiving_types": "caregiving_type",
+}
+PERIODS = ("day", "week", "month")
+REPORT_FORMATS = "^(json|csv)$"
+SQLITE_PERIODS = {
+    "week": ("-6 days", "weekday 1"),
+    "month": ("start of month",),
+}
+
+
+def period_start(db: Session, column, period: str):
+    """SQL expression for the first day of the week (Monday) or month containing ``column``."""
+    if period == "day":
+        return column
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        # period comes from PERIODS, so it is safe to inline; a bound parameter
+        # would make the SELECT and GROUP BY expressions differ for Postgres.
+        return func.date_trunc(literal_column(f"'{period}'"), column).cast(Date)
+    if dialect == "sqlite":
+        return func.date(column, *SQLITE_PERIODS[period], type_=Date)
+    raise NotImplementedError(f"Reports are not supported for {dialect}")
+
+
+def build_report(db: Session, group: str, period: str = "month", date_from: Optional[date] = None,
+                 date_to: Optional[date] = None, statuses: Optional[Sequence[str]] = None) -> List[Dict]:
+    key = GROUPS[group]
+    bucket = period_start(db, models.APPOINTMENT.appointment_date, period)
+    query = select(
+        key,
+        bucket,
+        models.APPOINTMENT.status,
+        func.count(),
+        func.coalesce(func.sum(models.APPOINTMENT.work_hours), 0),
+        func.coalesce(func.sum(models.APPOINTMENT.work_hours * models.CAREGIVER.hourly_rate), 0),
+    ).join(
+        models.CAREGIVER, models.CAREGIVER.caregiver_user_id == models.APPOINTMENT.caregiver_user_id
+    ).where(
+        models.APPOINTMENT.appointment_date.isnot(None)
+    ).group_by(key, bucket, models.APPOINTMENT.status).order_by(key, bucket, models.APPOINTMENT.status)
+    if date_from is not None:
+        query = query.where(models.APPOINTMENT.appointment_date >= date_from)
+    if date_to is not None:
+        query = query.where(models.APPOINTMENT.appointment_date <= date_to)
+    if statuses:
+        query = query.where(models.APPOINTMENT.status.in_(statuses))
+
+    field = GROUP_FIELDS[group]
+    return [
+        {
+            field: value,
+            "period": start,
+            "status": status,
+            "appointments": count,
+            "hours": float(hours),
+            "amount": round(float(amount), 2),
+        }
+        for value, start, status, count, hours, amount in db.execute(query)
+    ]
+
+
+def to_csv(rows: List[Dict], group: str) -> str:
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=[GROUP_FIELDS[group], "period", "status", "appointments", "hours", "amount"])
+    writer.writeheader()
+    writer.writerows(rows)
+    return out.getvalue()
+
+
+def main(argv=None):
+    from .database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Earnings and billing reports as CSV.")
+    parser.add_argument("group", choices=sorted(GROUPS))
+    parser.add_argument("--period", choices=PERIODS, default="month")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    parser.add_argument("--status", action="append", help="repeat to include several statuses")
+    args = parser.parse_args(argv)
+
+    with SessionLocal() as db:
+        rows = build_report(db, args.group, args.period, args.date_from, args.date_to, args.status)
+    sys.stdout.write(to_csv(rows, args.group))
+
+
+if __name__ == "__main__":
+    main()
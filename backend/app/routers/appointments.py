@@ -1,27 +1,206 @@
-from typing import List
-from .. import models, schemas, auth
-from ..database import get_db
+from collections import Counter
+from datetime import date, time, timedelta
+from typing import List, Optional
+from .. import models, schemas, auth, versioning, scheduling, events
+from ..database import get_db, get_read_db
+from ..querybudget import query_budget
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, update
 from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/appointments", tags=["appointments"])
 
+
+def ensure_no_conflicts(db: Session, caregiver_user_id: int, appointment_date, appointment_time, work_hours,
+                        exclude_id: int = None):
+    if appointment_date is None or appointment_time is None or work_hours is None:
+        return
+    if not 0 < work_hours <= scheduling.MAX_WORK_HOURS:
+        raise HTTPException(status_code=422, detail=f"work_hours must be between 1 and {scheduling.MAX_WORK_HOURS}")
+
+    conflicts = scheduling.find_conflicts(db, caregiver_user_id, appointment_date, appointment_time, work_hours,
+                                          exclude_id=exclude_id)
+    if conflicts:
+        db.rollback()
+        raise HTTPException(status_code=409, detail={
+            "message": "The caregiver already has an appointment at this time",
+            "conflicts": [schemas.Appointment.model_validate(a).model_dump(mode="json") for a in conflicts],
+        })
+
+
+MAX_AVAILABILITY_DAYS = 62
+MAX_BATCH_SIZE = 500
+
+
+def publish_status(db: Session, appointment: models.APPOINTMENT, status: str):
+    events.publish(db, [appointment.caregiver_user_id, appointment.member_user_id], events.APPOINTMENT_STATUS, {
+        "appointment_id": appointment.appointment_id,
+        "caregiver_user_id": appointment.caregiver_user_id,
+        "member_user_id": appointment.member_user_id,
+        "status": status,
+    })
+
+
+@router.get("/availability", response_model=List[schemas.CaregiverAvailability], dependencies=[query_budget(3)])
+def read_availability(
+    date_from: date,
+    date_to: date,
+    duration_hours: float = Query(..., gt=0, le=scheduling.MAX_WORK_HOURS),
+    caregiver_user_id: Optional[List[int]] = Query(None),
+    caregiving_type: Optional[str] = None,
+    day_start: time = time(8, 0),
+    day_end: time = time(20, 0),
+    limit: int = Query(500, ge=1, le=500),
+    db: Session = Depends(get_read_db),
+    current_user = Depends(auth.get_current_user)
+):
+    if date_to < date_from or (date_to - date_from).days >= MAX_AVAILABILITY_DAYS:
+        raise HTTPException(status_code=422, detail=f"date range must cover 1 to {MAX_AVAILABILITY_DAYS} days")
+    if day_end <= day_start:
+        raise HTTPException(status_code=422, detail="day_end must be after day_start")
+
+    caregivers = db.query(models.CAREGIVER.caregiver_user_id)
+    if caregiver_user_id:
+        caregivers = caregivers.filter(models.CAREGIVER.caregiver_user_id.in_(caregiver_user_id))
+    if caregiving_type is not None:
+        caregivers = caregivers.filter(models.CAREGIVER.caregiving_type == caregiving_type)
+    ids = [row.caregiver_user_id for row in caregivers.order_by(models.CAREGIVER.caregiver_user_id).limit(limit)]
+    if not ids:
+        return []
+
+    busy = scheduling.busy_intervals(db, ids, date_from, date_to)
+    windows = scheduling.working_windows(date_from, date_to, day_start, day_end)
+    duration = timedelta(hours=duration_hours)
+    return [
+        schemas.CaregiverAvailability(
+            caregiver_user_id=caregiver_id,
+            slots=[schemas.TimeSlot(start=start, end=end) for start, end in scheduling.free_slots(busy[caregiver_id], windows, duration)]
+        )
+        for caregiver_id in ids
+    ]
+
+
 @router.post("", response_model=schemas.Appointment)
 def create_appointment(appointment: schemas.AppointmentCreate, db: Session = Depends(get_db), current_user = Depends(auth.get_current_member)):
     if appointment.member_user_id != current_user.member_user_id:
         raise HTTPException(status_code=403, detail="You are not authorized to perform this action.")
 
+    # The process lock covers threads of this worker (and SQLite, which ignores
+    # FOR UPDATE); the caregiver row lock serializes bookings across workers.
+    with scheduling.caregiver_lock(appointment.caregiver_user_id):
+        if not scheduling.lock_caregiver(db, appointment.caregiver_user_id):
+            raise HTTPException(status_code=404, detail="Caregiver not found")
+        if appointment.status not in scheduling.INACTIVE_STATUSES:
+            ensure_no_conflicts(db, appointment.caregiver_user_id, appointment.appointment_date,
+                                appointment.appointment_time, appointment.work_hours)
 
-    db_appointment = models.APPOINTMENT(**appointment.model_dump())
-    db.add(db_appointment)
-    db.commit()
+        db_appointment = models.APPOINTMENT(**appointment.model_dump())
+        db.add(db_appointment)
+        versioning.bump(db, versioning.APPOINTMENTS)
+        db.flush()
+        events.publish(db, [db_appointment.caregiver_user_id, db_appointment.member_user_id], events.APPOINTMENT_CREATED,
+                       schemas.Appointment.model_validate(db_appointment).model_dump())
+        db.commit()
     db.refresh(db_appointment)
     return db_appointment
 
 
+@router.put("/status", response_model=List[schemas.AppointmentStatusResult])
+def update_appointment_statuses(changes: List[schemas.AppointmentStatusChange], db: Session = Depends(get_db), current_user = Depends(auth.get_current_member)):
+    if len(changes) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BATCH_SIZE} appointments per request")
+    counts = Counter(change.appointment_id for change in changes)
+    duplicates = sorted(appointment_id for appointment_id, count in counts.items() if count > 1)
+    if duplicates:
+        raise HTTPException(status_code=422, detail={
+            "message": "Each appointment may be listed only once",
+            "appointment_ids": duplicates,
+        })
+
+    ids = set(counts)
+    owned = {
+        appointment.appointment_id: appointment
+        for appointment in db.query(models.APPOINTMENT).filter(
+            models.APPOINTMENT.appointment_id.in_(ids),
+            models.APPOINTMENT.member_user_id == current_user.member_user_id,
+        )
+    } if ids else {}
+
+    errors = {}
+    targets = {}
+    for change in changes:
+        if change.appointment_id not in owned:
+            errors[change.appointment_id] = "Appointment not found"
+        else:
+            targets[change.appointment_id] = change.status.value
+
+    # Only re-activations can double-book. Any change to an active status may be
+    # one, so those caregivers are locked before the current statuses are read.
+    caregiver_ids = sorted({
+        owned[appointment_id].caregiver_user_id for appointment_id, status in targets.items()
+        if status not in scheduling.INACTIVE_STATUSES
+    })
+    with scheduling.caregiver_lock.many(caregiver_ids):
+        scheduling.lock_caregivers(db, caregiver_ids)
+        if caregiver_ids:
+            db.query(models.APPOINTMENT) \
+                .filter(models.APPOINTMENT.appointment_id.in_(targets)) \
+                .with_for_update() \
+                .populate_existing() \
+                .all()
+        reactivating = [
+            owned[appointment_id] for appointment_id, status in targets.items()
+            if owned[appointment_id].status in scheduling.INACTIVE_STATUSES
+            and status not in scheduling.INACTIVE_STATUSES
+        ]
+        released = {appointment_id for appointment_id, status in targets.items() if status in scheduling.INACTIVE_STATUSES}
+        booked = {}
+        for appointment in reactivating:
+            if appointment.appointment_date is None or appointment.appointment_time is None or not appointment.work_hours:
+                continue
+            interval = scheduling.appointment_interval(appointment.appointment_date, appointment.appointment_time,
+                                                       appointment.work_hours)
+            conflicts = [
+                other for other in scheduling.find_conflicts(
+                    db, appointment.caregiver_user_id, appointment.appointment_date, appointment.appointment_time,
+                    appointment.work_hours, exclude_id=appointment.appointment_id)
+                if other.appointment_id not in released
+            ]
+            # Appointments re-activated earlier in this batch are not in the database yet.
+            others = booked.setdefault(appointment.caregiver_user_id, [])
+            if conflicts or scheduling.IntervalIndex(others).overlapping(*interval):
+                errors[appointment.appointment_id] = "The caregiver already has an appointment at this time"
+                del targets[appointment.appointment_id]
+            else:
+                others.append(interval + (appointment.appointment_id,))
+
+        if targets:
+            db.execute(
+                update(models.APPOINTMENT)
+                .where(models.APPOINTMENT.appointment_id.in_(targets),
+                       models.APPOINTMENT.member_user_id == current_user.member_user_id)
+                .values(status=case(targets, value=models.APPOINTMENT.appointment_id))
+                .execution_options(synchronize_session=False)
+            )
+            versioning.bump(db, versioning.APPOINTMENTS)
+            for appointment_id, status in targets.items():
+                publish_status(db, owned[appointment_id], status)
+        db.commit()
+
+    return [
+        schemas.AppointmentStatusResult(
+            appointment_id=change.appointment_id,
+            status=change.status,
+            updated=change.appointment_id in targets and change.appointment_id not in errors,
+            error=errors.get(change.appointment_id)
+        )
+        for change in changes
+    ]
+
+
 @router.put("/{appointment_id}/{status}", response_model=schemas.Appointment)
-def update_appointment_status(appointment_id: int, status: str, db: Session = Depends(get_db), current_user = Depends(auth.get_current_member)):
+def update_appointment_status(appointment_id: int, status: schemas.AppointmentStatus, db: Session = Depends(get_db), current_user = Depends(auth.get_current_member)):
     appointment = db.query(models.APPOINTMENT).filter(
         models.APPOINTMENT.appointment_id == appointment_id,
         models.APPOINTMENT.member_user_id == current_user.member_user_id,
@@ -29,7 +208,19 @@ def update_appointment_status(appointment_id: int, status: str, db: Session = De
     if appointment is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
 
-    appointment.status = status
-    db.commit()
+    with scheduling.caregiver_lock(appointment.caregiver_user_id):
+        scheduling.lock_caregiver(db, appointment.caregiver_user_id)
+        # Re-read under the locks: a concurrent request may have changed the status.
+        db.refresh(appointment, with_for_update=True)
+        # Re-activating a declined or cancelled appointment must not double-book.
+        if appointment.status in scheduling.INACTIVE_STATUSES and status.value not in scheduling.INACTIVE_STATUSES:
+            ensure_no_conflicts(db, appointment.caregiver_user_id, appointment.appointment_date,
+                                appointment.appointment_time, appointment.work_hours,
+                                exclude_id=appointment.appointment_id)
+
+        appointment.status = status.value
+        versioning.bump(db, versioning.APPOINTMENTS)
+        publish_status(db, appointment, status.value)
+        db.commit()
     db.refresh(appointment)
     return appointment
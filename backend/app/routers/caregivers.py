@@ -1,15 +1,26 @@
-from typing import List
+from typing import List, Optional
 
 from starlette import status
 
 from .. import models, schemas, auth
-from ..database import get_db
-
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from ..database import get_db, get_async_read_db
+from ..querybudget import query_budget
+from ..pagination import encode_cursor, decode_cursor
+from .. import geo, registration, versioning
+from ..search_index import caregiver_index
+from ..streaming import stream_query, STREAM_FORMATS
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select, true
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, contains_eager
 
 router = APIRouter(prefix="/caregivers", tags=["caregivers"])
 
+# Stored on the USER row; changing any of them relocates the caregiver.
+LOCATION_FIELDS = {"city", "latitude", "longitude"}
+
 
 @router.post("", response_model=schemas.UserProfile)
 def create_caregiver(caregiver_data: schemas.CaregiverRegister, db: Session = Depends(get_db)):
@@ -20,32 +31,20 @@ def create_caregiver(caregiver_data: schemas.CaregiverRegister, db: Session = De
             detail="Email already registered"
         )
 
-    user_data = {
-        'email': caregiver_data.email,
-        'given_name': caregiver_data.given_name,
-        'surname': caregiver_data.surname,
-        'city': caregiver_data.city,
-        'phone_number': caregiver_data.phone_number,
-        'profile_description': caregiver_data.profile_description,
-        'password': auth.get_password_hash(caregiver_data.password)
-    }
-    db_user = models.USER(**user_data)
+    location = geo.resolve(db, caregiver_data.latitude, caregiver_data.longitude, caregiver_data.city)
+    db_user = models.USER(**registration.user_row(caregiver_data, auth.get_password_hash(caregiver_data.password), location))
+    caregiver_profile_data = registration.caregiver_row(caregiver_data)
+    db_user.caregiver = models.CAREGIVER(**caregiver_profile_data)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    caregiver_profile_data = {
-        'caregiver_user_id': db_user.user_id,
-        'photo': caregiver_data.photo,
-        'gender': caregiver_data.gender,
-        'caregiving_type': caregiver_data.caregiving_type if caregiver_data.caregiving_type else None,
-        'hourly_rate': caregiver_data.hourly_rate
-    }
-    db_caregiver = models.CAREGIVER(**caregiver_profile_data)
-    db.add(db_caregiver)
-    db.commit()
-
-    return schemas.UserProfile(
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    profile = schemas.UserProfile(
         user_id=db_user.user_id,
         email=db_user.email,
         given_name=db_user.given_name,
@@ -55,17 +54,157 @@ def create_caregiver(caregiver_data: schemas.CaregiverRegister, db: Session = De
         profile_description=db_user.profile_description,
         user_type="caregiver"
     )
+    versioning.bump(db, versioning.CAREGIVERS)
+    db.commit()
+    registration.sync_caregiver_indexes(db_user.user_id, db_user.city, caregiver_profile_data)
+    return profile
+
+
+class CaregiverFilters:
+    def __init__(
+        self,
+        caregiving_type: Optional[str] = None,
+        city: Optional[str] = None,
+        gender: Optional[str] = None,
+        min_hourly_rate: Optional[float] = Query(None, ge=0),
+        max_hourly_rate: Optional[float] = Query(None, ge=0),
+    ):
+        self.caregiving_type = caregiving_type
+        self.city = city
+        self.gender = gender
+        self.min_hourly_rate = min_hourly_rate
+        self.max_hourly_rate = max_hourly_rate
+
+    def apply(self, query):
+        if self.caregiving_type is not None:
+            query = query.filter(models.CAREGIVER.caregiving_type == self.caregiving_type)
+        if self.gender is not None:
+            query = query.filter(models.CAREGIVER.gender == self.gender)
+        if self.min_hourly_rate is not None:
+            query = query.filter(models.CAREGIVER.hourly_rate >= self.min_hourly_rate)
+        if self.max_hourly_rate is not None:
+            query = query.filter(models.CAREGIVER.hourly_rate <= self.max_hourly_rate)
+        if self.city is not None:
+            query = query.filter(models.USER.city == self.city)
+        return query
+
+
+def caregivers_statement(filters: CaregiverFilters):
+    statement = select(models.CAREGIVER) \
+        .join(models.CAREGIVER.user) \
+        .options(contains_eager(models.CAREGIVER.user))
+    return filters.apply(statement)
+
+
+def mark_caregiver(caregiver):
+    caregiver.user.user_type = "caregiver"
+
+
+@router.get("", response_model=List[schemas.Caregiver], dependencies=[versioning.conditional(versioning.CAREGIVERS), query_budget(2)])
+async def read_caregivers(
+    response: Response,
+    stream: Optional[str] = Query(None, pattern=STREAM_FORMATS),
+    filters: CaregiverFilters = Depends(),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    if stream:
+        return stream_query(
+            db, caregivers_statement(filters).order_by(models.CAREGIVER.caregiver_user_id),
+            schemas.Caregiver, stream, prepare=mark_caregiver, response=response
+        )
 
+    caregivers = (await db.scalars(caregivers_statement(filters))).all()
+    for caregiver in caregivers:
+        mark_caregiver(caregiver)
+    return caregivers
+
+
+@router.get("/page", response_model=schemas.CaregiverPage, dependencies=[versioning.conditional(versioning.CAREGIVERS), query_budget(2)])
+async def read_caregivers_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    filters: CaregiverFilters = Depends(),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    statement = caregivers_statement(filters)
+    if cursor:
+        last_id = decode_cursor(cursor).get("id")
+        if not isinstance(last_id, int):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        statement = statement.filter(models.CAREGIVER.caregiver_user_id > last_id)
+
+    # Fetch one extra row to know whether another page exists without a COUNT(*).
+    caregivers = (await db.scalars(
+        statement.order_by(models.CAREGIVER.caregiver_user_id).limit(limit + 1)
+    )).all()
+    next_cursor = None
+    if len(caregivers) > limit:
+        caregivers = caregivers[:limit]
+        next_cursor = encode_cursor({"id": caregivers[-1].caregiver_user_id})
 
-@router.get("", response_model=List[schemas.Caregiver])
-def read_caregivers(db: Session = Depends(get_db)):
-    caregivers = (db.query(models.CAREGIVER).options(joinedload(models.CAREGIVER.user)).all())
     for caregiver in caregivers:
         caregiver.user.user_type = "caregiver"
-    return caregivers
+    return schemas.CaregiverPage(items=caregivers, next_cursor=next_cursor)
+
+
+@router.get("/search", response_model=schemas.CaregiverSearchResult)
+async def search_caregivers(
+    limit: int = Query(1000, ge=1, le=10000),
+    bucket_width: float = Query(5.0, gt=0),
+    filters: CaregiverFilters = Depends(),
+    db: AsyncSession = Depends(get_async_read_db)
+):
+    await caregiver_index.ensure_loaded_async(db)
+    result = caregiver_index.search(
+        caregiving_type=filters.caregiving_type,
+        city=filters.city,
+        gender=filters.gender,
+        min_hourly_rate=filters.min_hourly_rate,
+        max_hourly_rate=filters.max_hourly_rate,
+        bucket_width=bucket_width
+    )
+    ids = result["caregiver_user_ids"]
+    return schemas.CaregiverSearchResult(
+        total=len(ids),
+        caregiver_user_ids=ids[:limit],
+        facets=result["facets"],
+        hourly_rate_histogram=result["hourly_rate_histogram"]
+    )
+
+@router.get("/nearby", response_model=List[schemas.NearbyCaregiver], dependencies=[query_budget(3)])
+async def read_nearby_caregivers(
+    radius_km: float = Query(10, gt=0, le=geo.MAX_RADIUS_KM),
+    caregiving_type: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user = Depends(auth.get_current_member)
+):
+    """Caregivers within ``radius_km`` of the member's address (or city), nearest first."""
+    # ADDRESS is keyed by member_user_id: this is the member's single address, if any.
+    address = select(models.ADDRESS.latitude, models.ADDRESS.longitude) \
+        .where(models.ADDRESS.member_user_id == current_user.member_user_id) \
+        .subquery()
+    row = (await db.execute(
+        select(address.c.latitude, address.c.longitude, models.USER.latitude, models.USER.longitude)
+        .select_from(models.USER)
+        .outerjoin(address, true())
+        .where(models.USER.user_id == current_user.member_user_id)
+    )).one_or_none()
+    if row is not None and row[0] is not None and row[1] is not None:
+        latitude, longitude = row[0], row[1]
+    elif row is not None and row[2] is not None and row[3] is not None:
+        latitude, longitude = row[2], row[3]
+    else:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                            detail="Your address has no coordinates; set latitude and longitude")
+
+    matches = await db.run_sync(geo.nearby_caregivers, latitude, longitude, radius_km, caregiving_type, limit)
+    return [schemas.NearbyCaregiver(caregiver_user_id=caregiver_user_id, distance_km=distance)
+            for caregiver_user_id, distance in matches]
+
 
 @router.get("/my_caregiver_data", response_model=schemas.CaregiverBase)
-def get_caregiver(db: Session = Depends(get_db), current_user = Depends(auth.get_current_caregiver)):
+async def get_caregiver(current_user = Depends(auth.get_current_caregiver)):
     return current_user
 
 
@@ -74,11 +213,32 @@ def update_caregiver(caregiver_data: schemas.CaregiverUpdate, db: Session = Depe
     if caregiver_data.caregiver_user_id != current_user.caregiver_user_id:
         raise HTTPException(status_code=status.HTTP_405_METHOD_NOT_ALLOWED, detail="Not allowed")
 
-    caregiver = db.query(models.CAREGIVER).filter(models.CAREGIVER.caregiver_user_id == caregiver_data.caregiver_user_id).first()
-    update_data = caregiver_data.model_dump(exclude_unset=True)
+    location_data = caregiver_data.model_dump(exclude_unset=True, include=LOCATION_FIELDS)
+
+    caregiver = db.query(models.CAREGIVER).options(joinedload(models.CAREGIVER.user)) \
+        .filter(models.CAREGIVER.caregiver_user_id == caregiver_data.caregiver_user_id).first()
+    update_data = caregiver_data.model_dump(exclude_unset=True, exclude={"caregiver_user_id", *LOCATION_FIELDS})
     for key, value in update_data.items():
         setattr(caregiver, key, value)
 
+    user = caregiver.user
+    if location_data:
+        user.city = location_data.get("city", user.city)
+        location = geo.resolve(db, location_data.get("latitude"), location_data.get("longitude"), user.city)
+        for key, value in geo.user_columns(location).items():
+            setattr(user, key, value)
+
+    versioning.bump(db, versioning.CAREGIVERS)
     db.commit()
-    db.refresh(caregiver)
-    return caregiver
+    auth.invalidate_user(caregiver.caregiver_user_id)
+    registration.sync_caregiver_indexes(caregiver.caregiver_user_id, user.city, registration.caregiver_row(caregiver))
+    return schemas.CaregiverUpdate(
+        caregiver_user_id=caregiver.caregiver_user_id,
+        photo=caregiver.photo,
+        gender=caregiver.gender,
+        caregiving_type=caregiver.caregiving_type,
+        hourly_rate=caregiver.hourly_rate,
+        city=user.city,
+        latitude=user.latitude,
+        longitude=user.longitude
+    )
@@ -0,0 +1,58 @@
+from typing import Optional
+
+from starlette.responses import StreamingResponse
+
+from .. import auth, events, schemas
+from ..database import get_async_db
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
+
+router = APIRouter(prefix="/events", tags=["events"])
+
+TICKET_PURPOSE = "events"
+
+
+@router.post("/ticket", response_model=schemas.EventTicket)
+async def create_event_ticket(principal: dict = Depends(auth.get_principal)):
+    """Single-use ticket for ``GET /events?ticket=...``.
+
+    EventSource cannot send headers, and a long-lived access token in the URL
+    would end up in access logs; the ticket is only good for opening one
+    stream within ``auth.TICKET_TTL`` seconds.
+    """
+    ticket = auth.create_ticket(TICKET_PURPOSE, principal["user"]["user_id"], principal["expires_at"])
+    return schemas.EventTicket(ticket=ticket, expires_in=auth.TICKET_TTL)
+
+
+@router.get("")
+async def stream_events(
+    request: Request,
+    ticket: Optional[str] = Query(None, description="From POST /events/ticket, for EventSource"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Server-Sent Events for the authenticated user.
+
+    Events: ``job_application.created``, ``job_application.deleted``,
+    ``appointment.created`` and ``appointment.status``, each with a JSON body.
+    The stream ends when the access token expires.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        principal = await auth.get_principal(HTTPAuthorizationCredentials(scheme="Bearer", credentials=token), db)
+        user_id, expires_at = principal["user"]["user_id"], principal["expires_at"]
+    elif ticket:
+        user_id, expires_at = auth.redeem_ticket(ticket, TICKET_PURPOSE)
+    else:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+    # The session would otherwise stay open (and keep its connection) for the
+    # whole lifetime of the stream.
+    await db.close()
+
+    return StreamingResponse(
+        events.broker.stream(user_id, expires_at),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
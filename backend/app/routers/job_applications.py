@@ -2,40 +2,90 @@ from typing import List
 
 from starlette import status
 
-from .. import models, schemas
-from ..database import get_db
+from .. import events, models, schemas, versioning
+from ..database import get_db, dialect_insert
 from ..auth import get_current_user, get_current_member, get_current_caregiver
 
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/job_applications", tags=["job_applications"])
 
+MAX_BULK_JOBS = 500
+
+
+def insert_applications(db: Session, caregiver_user_id: int, job_ids: List[int]) -> dict:
+    """Apply to several jobs in one INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+
+    The SELECT joins job and caregiver, so unknown ids simply produce no row,
+    and the composite primary key turns duplicates into no-ops. Returns
+    ``{job_id: date_applied}`` for the rows actually inserted.
+    """
+    candidates = select(models.CAREGIVER.caregiver_user_id, models.JOB.job_id) \
+        .select_from(models.JOB) \
+        .join(models.CAREGIVER, models.CAREGIVER.caregiver_user_id == caregiver_user_id) \
+        .where(models.JOB.job_id.in_(job_ids))
+    statement = dialect_insert(db, models.JOB_APPLICATION) \
+        .from_select(["caregiver_user_id", "job_id"], candidates) \
+        .on_conflict_do_nothing() \
+        .returning(models.JOB_APPLICATION.job_id, models.JOB_APPLICATION.date_applied)
+    inserted = dict(db.execute(statement).all())
+    if inserted:
+        versioning.bump(db, versioning.JOB_APPLICATIONS)
+        owners = db.execute(
+            select(models.JOB.job_id, models.JOB.member_user_id).where(models.JOB.job_id.in_(inserted))
+        ).all()
+        for job_id, member_user_id in owners:
+            events.publish(db, [caregiver_user_id, member_user_id], events.JOB_APPLICATION_CREATED, {
+                "caregiver_user_id": caregiver_user_id, "job_id": job_id, "date_applied": inserted[job_id],
+            })
+    db.commit()
+    return inserted
+
+
+def existing_applications(db: Session, caregiver_user_id: int, job_ids) -> set:
+    return set(db.scalars(
+        select(models.JOB_APPLICATION.job_id).where(
+            models.JOB_APPLICATION.caregiver_user_id == caregiver_user_id,
+            models.JOB_APPLICATION.job_id.in_(job_ids)
+        )
+    ))
+
 
 @router.post("", response_model=schemas.JobApplicationBase)
 def create_job_application(application: schemas.JobApplicationBase, db: Session = Depends(get_db), current_user = Depends(get_current_caregiver)):
-    job = db.query(models.JOB).filter(models.JOB.job_id == application.job_id).first()
-    if not job:
+    if insert_applications(db, application.caregiver_user_id, [application.job_id]):
+        return application
+
+    # Nothing was inserted; only now find out why.
+    if existing_applications(db, application.caregiver_user_id, [application.job_id]):
+        raise HTTPException(status_code=400, detail="Application already exists")
+    if db.get(models.JOB, application.job_id) is None:
         raise HTTPException(status_code=404, detail="Job not found")
+    raise HTTPException(status_code=404, detail="Caregiver not found")
 
-    caregiver = db.query(models.CAREGIVER).filter(
-        models.CAREGIVER.caregiver_user_id == application.caregiver_user_id
-    ).first()
-    if not caregiver:
-        raise HTTPException(status_code=404, detail="Caregiver not found")
 
-    existing = db.query(models.JOB_APPLICATION).filter(
-        models.JOB_APPLICATION.job_id == application.job_id,
-        models.JOB_APPLICATION.caregiver_user_id == application.caregiver_user_id
-    ).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="Application already exists")
+@router.post("/bulk", response_model=schemas.BulkApplyResult)
+def apply_to_jobs(request: schemas.BulkApplyRequest, db: Session = Depends(get_db), current_user = Depends(get_current_caregiver)):
+    job_ids = list(dict.fromkeys(request.job_ids))
+    if len(job_ids) > MAX_BULK_JOBS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_BULK_JOBS} jobs per request")
+    if not job_ids:
+        return schemas.BulkApplyResult(applied=[], already_applied=[], not_found=[])
 
-    db_app = models.JOB_APPLICATION(**application.model_dump())
-    db.add(db_app)
-    db.commit()
-    db.refresh(db_app)
-    return db_app
+    caregiver_user_id = current_user.caregiver_user_id
+    inserted = insert_applications(db, caregiver_user_id, job_ids)
+    rest = [job_id for job_id in job_ids if job_id not in inserted]
+    existing = existing_applications(db, caregiver_user_id, rest) if rest else set()
+    return schemas.BulkApplyResult(
+        applied=[
+            schemas.JobApplicationOut(caregiver_user_id=caregiver_user_id, job_id=job_id, date_applied=inserted[job_id])
+            for job_id in job_ids if job_id in inserted
+        ],
+        already_applied=[job_id for job_id in rest if job_id in existing],
+        not_found=[job_id for job_id in rest if job_id not in existing]
+    )
 
 
 @router.delete("/{job_id}/{caregiver_user_id}", status_code=204)
@@ -43,13 +93,20 @@ def delete_job_application(job_id: int, caregiver_user_id: int, db: Session = De
     if not current_user.caregiver_user_id == caregiver_user_id:
         raise HTTPException(status_code=403, detail="You are not authorized to do this")
 
-    app = db.query(models.JOB_APPLICATION).filter(
+    row = db.query(models.JOB_APPLICATION, models.JOB.member_user_id).join(
+        models.JOB, models.JOB.job_id == models.JOB_APPLICATION.job_id
+    ).filter(
         models.JOB_APPLICATION.job_id == job_id,
         models.JOB_APPLICATION.caregiver_user_id == caregiver_user_id
     ).first()
-    if not app:
+    if not row:
         raise HTTPException(status_code=404, detail="Job application not found")
 
+    app, member_user_id = row
     db.delete(app)
+    versioning.bump(db, versioning.JOB_APPLICATIONS)
+    events.publish(db, [caregiver_user_id, member_user_id], events.JOB_APPLICATION_DELETED, {
+        "caregiver_user_id": caregiver_user_id, "job_id": job_id,
+    })
     db.commit()
     return
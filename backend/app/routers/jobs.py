@@ -1,12 +1,18 @@
-from typing import List
+from datetime import date
+from typing import List, Optional
 
 from starlette import status
 
-from .. import models, schemas
-from ..database import get_db
+from .. import models, schemas, versioning
+from ..database import get_db, get_async_read_db
+from ..querybudget import query_budget
 from ..auth import get_current_user, get_current_member, get_current_caregiver
+from ..pagination import encode_cursor, decode_cursor
+from ..matching import caregiver_features
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
@@ -28,17 +34,113 @@ def create_job(job: schemas.JobCreate, db: Session = Depends(get_db), current_us
 
     db_job = models.JOB(**job.model_dump())
     db.add(db_job)
+    versioning.bump(db, versioning.JOBS)
     db.commit()
     db.refresh(db_job)
     return db_job
 
 
-@router.get("", response_model=List[schemas.Job])
-def read_jobs(db: Session = Depends(get_db), current_user = Depends(get_current_user)):
-    jobs = db.query(models.JOB).all()
+class JobFilters:
+    def __init__(
+        self,
+        required_caregiving_type: Optional[str] = None,
+        posted_from: Optional[date] = None,
+        posted_to: Optional[date] = None,
+        member_user_id: Optional[int] = None,
+    ):
+        self.required_caregiving_type = required_caregiving_type
+        self.posted_from = posted_from
+        self.posted_to = posted_to
+        self.member_user_id = member_user_id
+
+    def apply(self, query):
+        if self.required_caregiving_type is not None:
+            query = query.filter(models.JOB.required_caregiving_type == self.required_caregiving_type)
+        if self.posted_from is not None:
+            query = query.filter(models.JOB.date_posted >= self.posted_from)
+        if self.posted_to is not None:
+            query = query.filter(models.JOB.date_posted <= self.posted_to)
+        if self.member_user_id is not None:
+            query = query.filter(models.JOB.member_user_id == self.member_user_id)
+        return query
+
+
+@router.get("", response_model=List[schemas.Job], dependencies=[versioning.conditional(versioning.JOBS, per_user=True), query_budget(3)])
+async def read_jobs(filters: JobFilters = Depends(), db: AsyncSession = Depends(get_async_read_db), current_user = Depends(get_current_user)):
+    jobs = (await db.scalars(filters.apply(select(models.JOB)))).all()
     return jobs
 
 
+@router.get("/page", response_model=schemas.JobPage, dependencies=[versioning.conditional(versioning.JOBS, per_user=True), query_budget(3)])
+async def read_jobs_page(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    filters: JobFilters = Depends(),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user = Depends(get_current_user)
+):
+    statement = filters.apply(select(models.JOB))
+    if cursor:
+        data = decode_cursor(cursor)
+        try:
+            last_date = None if data["date_posted"] is None else date.fromisoformat(data["date_posted"])
+            last_id = int(data["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        if last_date is None:
+            statement = statement.filter(or_(
+                and_(models.JOB.date_posted.is_(None), models.JOB.job_id < last_id),
+                models.JOB.date_posted.is_not(None)
+            ))
+        else:
+            # Undated jobs sort first, so they are all behind a dated cursor.
+            statement = statement.filter(or_(
+                models.JOB.date_posted < last_date,
+                and_(models.JOB.date_posted == last_date, models.JOB.job_id < last_id)
+            ))
+
+    # NULLS FIRST is PostgreSQL's default for DESC, i.e. a backward scan of
+    # ix_job_date_posted_job_id; spelling it out gives SQLite the same order.
+    jobs = (await db.scalars(
+        statement.order_by(models.JOB.date_posted.desc().nulls_first(), models.JOB.job_id.desc()).limit(limit + 1)
+    )).all()
+    next_cursor = None
+    if len(jobs) > limit:
+        jobs = jobs[:limit]
+        last = jobs[-1]
+        next_cursor = encode_cursor({
+            "date_posted": None if last.date_posted is None else last.date_posted.isoformat(),
+            "id": last.job_id,
+        })
+    return schemas.JobPage(items=jobs, next_cursor=next_cursor)
+
+
+@router.get("/{job_id}/recommended_caregivers", response_model=List[schemas.CaregiverMatch], dependencies=[query_budget(5)])
+async def recommend_caregivers(
+    job_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user = Depends(get_current_member)
+):
+    job = await db.get(models.JOB, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.member_user_id != current_user.member_user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not authorized to view recommendations for this job"
+        )
+
+    address = await db.scalar(
+        select(models.ADDRESS).where(models.ADDRESS.member_user_id == job.member_user_id).limit(1)
+    )
+    city = address.town if address and address.town else current_user.user.city
+
+    await caregiver_features.ensure_loaded_async(db)
+    matches = caregiver_features.rank(job.required_caregiving_type, city, limit=limit)
+    return [schemas.CaregiverMatch(caregiver_user_id=caregiver_user_id, score=score) for caregiver_user_id, score in matches]
+
+
 @router.put("/{job_id}", response_model=schemas.Job)
 def update_job(
     job_id: int,
@@ -60,6 +162,7 @@ def update_job(
     for key, value in update_data.items():
         setattr(job, key, value)
 
+    versioning.bump(db, versioning.JOBS)
     db.commit()
     db.refresh(job)
     return job
@@ -82,6 +185,7 @@ def delete_job(
         )
 
     db.delete(job)
+    versioning.bump(db, versioning.JOBS, versioning.JOB_APPLICATIONS)
     db.commit()
     return
 
@@ -1,11 +1,16 @@
-from typing import List
+from typing import List, Optional
 
 from starlette import status
 
-from .. import models, schemas, auth
-from ..database import get_db
+from .. import geo, models, schemas, auth, registration, versioning
+from ..database import get_db, get_async_read_db
+from ..querybudget import query_budget
+from ..streaming import stream_query, STREAM_FORMATS
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 
 router = APIRouter(prefix="/members", tags=["members"])
@@ -20,42 +25,23 @@ def create_member(member_data: schemas.MemberRegister, db: Session = Depends(get
             detail="Email already registered"
         )
 
-    user_data = {
-        'email': member_data.email,
-        'given_name': member_data.given_name,
-        'surname': member_data.surname,
-        'city': member_data.city,
-        'phone_number': member_data.phone_number,
-        'profile_description': member_data.profile_description,
-        'password': auth.get_password_hash(member_data.password)
-    }
-    db_user = models.USER(**user_data)
+    places = geo.geocode_many(db, [member_data.city, member_data.town])
+    db_user = models.USER(**registration.user_row(member_data, auth.get_password_hash(member_data.password),
+                                                  registration.user_location(places, "members", member_data)))
+    db_member = models.MEMBER(**registration.member_row(member_data))
+    db_member.addresses = [models.ADDRESS(**registration.address_row(
+        member_data, registration.address_location(places, member_data)))]
+    db_user.member = db_member
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    member_profile_data = {
-        'member_user_id': db_user.user_id,
-        'house_rules': member_data.house_rules,
-        'dependent_description': member_data.dependent_description
-    }
-    db_member = models.MEMBER(**member_profile_data)
-    db.add(db_member)
-    db.commit()
-    db.refresh(db_member)
-
-    address_data = {
-        'member_user_id': db_member.member_user_id,
-        'house_number': member_data.house_number,
-        'street': member_data.street,
-        'town': member_data.town,
-    }
-    db_address = models.ADDRESS(**address_data)
-    db.add(db_address)
-    db.commit()
-
-
-    return schemas.UserProfile(
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
+    profile = schemas.UserProfile(
         user_id=db_user.user_id,
         email=db_user.email,
         given_name=db_user.given_name,
@@ -65,10 +51,13 @@ def create_member(member_data: schemas.MemberRegister, db: Session = Depends(get
         profile_description=db_user.profile_description,
         user_type="member"
     )
+    versioning.bump(db, versioning.MEMBERS)
+    db.commit()
+    return profile
 
 
 @router.get("/my_member_data", response_model=schemas.MemberBase)
-def get_member(db: Session = Depends(get_db), current_user = Depends(auth.get_current_member)):
+async def get_member(current_user = Depends(auth.get_current_member)):
     return current_user
 
 
@@ -82,14 +71,17 @@ def update_member(member_data: schemas.MemberUpdate, db: Session = Depends(get_d
     for key, value in update_data.items():
         setattr(member, key, value)
 
+    versioning.bump(db, versioning.MEMBERS)
     db.commit()
     db.refresh(member)
+    auth.invalidate_user(member.member_user_id)
     return member
 
 
 @router.get("/my_address_data", response_model=schemas.AddressBase)
-def get_address(db: Session = Depends(get_db), current_user = Depends(auth.get_current_member)):
-    address = db.query(models.ADDRESS).filter(models.ADDRESS.member_user_id == current_user.member_user_id).first()
+async def get_address(db: AsyncSession = Depends(get_async_read_db), current_user = Depends(auth.get_current_member)):
+    address = await db.scalar(
+        select(models.ADDRESS).where(models.ADDRESS.member_user_id == current_user.member_user_id).limit(1))
     return address or {}
 
 
@@ -104,7 +96,10 @@ def update_address(address_data: schemas.Address, db: Session = Depends(get_db),
     update_data = address_data.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(address, key, value)
+    if "town" in update_data and "latitude" not in update_data and "longitude" not in update_data:
+        address.latitude, address.longitude = geo.resolve(db, None, None, address.town)
 
+    versioning.bump(db, versioning.MEMBERS)
     db.commit()
     db.refresh(address)
     return address
@@ -118,17 +113,34 @@ def set_address(address_data: schemas.Address, db: Session = Depends(get_db), cu
     address = db.query(models.ADDRESS).filter(models.ADDRESS.member_user_id == address_data.member_user_id).first()
     if address:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Address already exists")
-    address = models.ADDRESS(**address_data.model_dump(exclude_unset=True))
+    location = geo.resolve(db, address_data.latitude, address_data.longitude, address_data.town)
+    address = models.ADDRESS(**{**address_data.model_dump(exclude_unset=True), **geo.address_columns(location)})
     db.add(address)
+    versioning.bump(db, versioning.MEMBERS)
     db.commit()
     db.refresh(address)
     return address
 
 
-@router.get("", response_model=List[schemas.Member])
-def read_members(db: Session = Depends(get_db)):
-    members = db.query(models.MEMBER).options(joinedload(models.MEMBER.user)).all()
+def mark_member(member):
+    member.user.user_type = "member"
+
+
+def members_statement():
+    return select(models.MEMBER).options(joinedload(models.MEMBER.user))
+
+
+@router.get("", response_model=List[schemas.Member], dependencies=[versioning.conditional(versioning.MEMBERS), query_budget(2)])
+async def read_members(response: Response, stream: Optional[str] = Query(None, pattern=STREAM_FORMATS),
+                       db: AsyncSession = Depends(get_async_read_db)):
+    if stream:
+        return stream_query(
+            db, members_statement().order_by(models.MEMBER.member_user_id),
+            schemas.Member, stream, prepare=mark_member, response=response
+        )
+
+    members = (await db.scalars(members_statement())).all()
     for member in members:
-        member.user.user_type = "member"
+        mark_member(member)
     return members
 
@@ -0,0 +1,35 @@
+import io
+from typing import Optional
+
+from starlette import status
+
+from .. import auth, schemas, onboarding
+from ..database import get_db
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy.orm import Session
+
+router = APIRouter(prefix="/onboarding", tags=["onboarding"])
+
+require_onboarding_key = auth.api_key_header("X-Onboarding-Key", "ONBOARDING_API_KEY")
+
+
+@router.post("/{role}", response_model=schemas.BulkImportResult, dependencies=[Depends(require_onboarding_key)])
+def bulk_import(
+    role: str,
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    batch_size: int = Query(onboarding.DEFAULT_BATCH_SIZE, ge=1, le=5000),
+    db: Session = Depends(get_db)
+):
+    if role not in onboarding.ROLES:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Unknown role")
+
+    fmt = format or onboarding.detect_format(file.filename)
+    try:
+        onboarding.ensure_utf8(file.file)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File is not UTF-8 encoded")
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    results = onboarding.import_records(db, role, onboarding.read_records(stream, fmt), batch_size)
+    return onboarding.summarize(results)
@@ -0,0 +1,41 @@
+from datetime import date
+from typing import List, Optional
+
+from starlette.responses import Response
+
+from .. import auth, reports
+from ..database import get_read_db
+from ..serialization import ResponseAdapter
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+report_adapter = ResponseAdapter(List[dict], trusted=True)
+require_reports_key = auth.api_key_header("X-Reports-Key", "REPORTS_API_KEY")
+
+
+def report_response(db: Session, group: str, period: str, date_from: Optional[date], date_to: Optional[date],
+                    statuses: Optional[List[str]], format: str) -> Response:
+    rows = reports.build_report(db, group, period, date_from, date_to, statuses)
+    if format == "csv":
+        return Response(reports.to_csv(rows, group), media_type="text/csv", headers={
+            "Content-Disposition": f'attachment; filename="{group}_{period}.csv"'
+        })
+    return report_adapter.response(rows)
+
+
+@router.get("/{group}", dependencies=[Depends(require_reports_key)])
+def read_report(
+    group: str,
+    period: str = Query("month", pattern="^(day|week|month)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    status: Optional[List[str]] = Query(None),
+    format: str = Query("json", pattern=reports.REPORT_FORMATS),
+    db: Session = Depends(get_read_db)
+):
+    if group not in reports.GROUPS:
+        raise HTTPException(status_code=404, detail="Unknown report")
+    return report_response(db, group, period, date_from, date_to, status, format)
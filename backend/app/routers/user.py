@@ -1,65 +1,66 @@
 from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
 from typing import List
-from .. import models, schemas, auth
-from ..database import get_db
+from .. import models, schemas, auth, versioning
+from ..database import get_async_read_db
+from ..querybudget import query_budget
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from ..serialization import ResponseAdapter
 
 router = APIRouter(prefix="/user", tags=["user"])
 
+# Application rows are built from non-null USER columns and typed job/caregiver
+# columns that already match the schema, so they skip validation. Appointment
+# rows are still validated once: the schema requires phone numbers the
+# USER table allows to be NULL.
+applications_adapter = ResponseAdapter(List[schemas.ApplicationsForJobOut], trusted=True)
+appointments_adapter = ResponseAdapter(List[schemas.AppointmentOut])
+
 
 @router.get("/me", response_model=schemas.UserProfile)
-async def get_current_user_profile(
-        db: Session = Depends(get_db), current_user: models.USER = Depends(auth.get_current_user)
-):
-    # Determine user type
-    caregiver = db.query(models.CAREGIVER).filter(
-        models.CAREGIVER.caregiver_user_id == current_user.user_id
-    ).first()
-    member = db.query(models.MEMBER).filter(
-        models.MEMBER.member_user_id == current_user.user_id
-    ).first()
-
-    user_type = "caregiver" if caregiver else "member" if member else "unknown"
+async def get_current_user_profile(principal: dict = Depends(auth.get_principal)):
+    user_type = auth.principal_user_type(principal)
+    current_user = principal["user"]
 
     return schemas.UserProfile(
-        user_id=current_user.user_id,
-        email=current_user.email,
-        given_name=current_user.given_name,
-        surname=current_user.surname,
-        city=current_user.city,
-        phone_number=current_user.phone_number,
-        profile_description=current_user.profile_description,
+        user_id=current_user["user_id"],
+        email=current_user["email"],
+        given_name=current_user["given_name"],
+        surname=current_user["surname"],
+        city=current_user["city"],
+        phone_number=current_user["phone_number"],
+        profile_description=current_user["profile_description"],
         user_type=user_type
     )
 
-@router.get("/jobs", response_model=List[schemas.Job])
-def get_my_jobs(db: Session = Depends(get_db), current_user = Depends(auth.get_current_member)):
-    jobs = db.query(models.JOB).filter(models.JOB.member_user_id == current_user.member_user_id)
-    return jobs
+@router.get("/jobs", response_model=List[schemas.Job],
+            dependencies=[versioning.conditional(versioning.JOBS, per_user=True), query_budget(3)])
+async def get_my_jobs(db: AsyncSession = Depends(get_async_read_db), current_user = Depends(auth.get_current_member)):
+    jobs = await db.scalars(select(models.JOB).where(models.JOB.member_user_id == current_user.member_user_id))
+    return jobs.all()
 
 
-@router.get("/job_applications", response_model=List[schemas.ApplicationsForJobOut])
-def get_job_applications(db: Session = Depends(get_db), current_user = Depends(auth.get_current_member)):
-    member_jobs = db.query(models.JOB).filter(
+@router.get("/job_applications", response_model=List[schemas.ApplicationsForJobOut],
+            dependencies=[versioning.conditional(versioning.JOB_APPLICATIONS, versioning.JOBS, versioning.CAREGIVERS, per_user=True), query_budget(4)])
+async def get_job_applications(response: Response, db: AsyncSession = Depends(get_async_read_db), current_user = Depends(auth.get_current_member)):
+    job_ids = (await db.scalars(select(models.JOB.job_id).where(
         models.JOB.member_user_id == current_user.member_user_id
-    ).all()
-
-    if not member_jobs:
-        return []
+    ))).all()
 
-    job_ids = [job.job_id for job in member_jobs]
+    if not job_ids:
+        return applications_adapter.response([], response)
 
-    applications = db.query(models.JOB_APPLICATION).filter(
+    applications = (await db.scalars(select(models.JOB_APPLICATION).where(
         models.JOB_APPLICATION.job_id.in_(job_ids)
     ).options(
         joinedload(models.JOB_APPLICATION.job),
         joinedload(models.JOB_APPLICATION.caregiver).joinedload(models.CAREGIVER.user)
-    ).all()
+    ))).all()
 
-    return [
+    return applications_adapter.response([
         {
             "caregiver_user_id": app.caregiver_user_id,
             "job": {
@@ -67,6 +68,7 @@ def get_job_applications(db: Session = Depends(get_db), current_user = Depends(a
                 "member_user_id": app.job.member_user_id,
                 "required_caregiving_type": app.job.required_caregiving_type,
                 "other_requirements": app.job.other_requirements,
+                "date_posted": app.job.date_posted,
             },
             "date_applied": app.date_applied,
             "email": app.caregiver.user.email,
@@ -81,25 +83,27 @@ def get_job_applications(db: Session = Depends(get_db), current_user = Depends(a
             "hourly_rate": app.caregiver.hourly_rate
         }
         for app in applications
-    ]
+    ], response)
 
 
-@router.get("/my_applications", response_model=List[schemas.JobApplicationOut])
-def get_my_applications(db: Session = Depends(get_db), current_user = Depends(auth.get_current_caregiver)):
-    app = db.query(models.JOB_APPLICATION).filter(
+@router.get("/my_applications", response_model=List[schemas.JobApplicationOut],
+            dependencies=[versioning.conditional(versioning.JOB_APPLICATIONS, per_user=True), query_budget(3)])
+async def get_my_applications(db: AsyncSession = Depends(get_async_read_db), current_user = Depends(auth.get_current_caregiver)):
+    app = await db.scalars(select(models.JOB_APPLICATION).where(
         models.JOB_APPLICATION.caregiver_user_id == current_user.caregiver_user_id
-    )
-    return app
+    ))
+    return app.all()
 
 
-@router.get("/caregiver_appointments", response_model=List[schemas.AppointmentOut])
-def read_caregiver_appointments(db: Session = Depends(get_db), current_user = Depends(auth.get_current_caregiver)):
-    appointments = db.query(models.APPOINTMENT) \
-        .filter(models.APPOINTMENT.caregiver_user_id == current_user.caregiver_user_id) \
+@router.get("/caregiver_appointments", response_model=List[schemas.AppointmentOut],
+            dependencies=[versioning.conditional(versioning.APPOINTMENTS, versioning.MEMBERS, per_user=True), query_budget(3)])
+async def read_caregiver_appointments(response: Response, db: AsyncSession = Depends(get_async_read_db), current_user = Depends(auth.get_current_caregiver)):
+    appointments = (await db.scalars(select(models.APPOINTMENT)
+        .where(models.APPOINTMENT.caregiver_user_id == current_user.caregiver_user_id)
         .options(
         joinedload(models.APPOINTMENT.member).joinedload(models.MEMBER.user),
         joinedload(models.APPOINTMENT.member).joinedload(models.MEMBER.addresses)
-    )
+    ))).unique()
     context = []
     for appointment in appointments:
         address = appointment.member.addresses[0] if appointment.member.addresses else None
@@ -130,16 +134,18 @@ def read_caregiver_appointments(db: Session = Depends(get_db), current_user = De
             }
         })
 
-    return context
+    return appointments_adapter.response(context, response)
 
 
-@router.get("/member_appointments", response_model=List[schemas.AppointmentOut])
-def read_member_appointments(db: Session = Depends(get_db), current_user = Depends(auth.get_current_member)):
-    address = db.query(models.ADDRESS).filter(models.ADDRESS.member_user_id == current_user.member_user_id).first()
-    appointments = db.query(models.APPOINTMENT) \
-                    .filter(models.APPOINTMENT.member_user_id == current_user.member_user_id) \
-                    .options(joinedload(models.APPOINTMENT.caregiver).joinedload(models.CAREGIVER.user))
-    return [{
+@router.get("/member_appointments", response_model=List[schemas.AppointmentOut],
+            dependencies=[versioning.conditional(versioning.APPOINTMENTS, versioning.CAREGIVERS, versioning.MEMBERS, per_user=True), query_budget(4)])
+async def read_member_appointments(response: Response, db: AsyncSession = Depends(get_async_read_db), current_user = Depends(auth.get_current_member)):
+    address = await db.scalar(
+        select(models.ADDRESS).where(models.ADDRESS.member_user_id == current_user.member_user_id).limit(1))
+    appointments = await db.scalars(select(models.APPOINTMENT)
+                    .where(models.APPOINTMENT.member_user_id == current_user.member_user_id)
+                    .options(joinedload(models.APPOINTMENT.caregiver).joinedload(models.CAREGIVER.user)))
+    return appointments_adapter.response([{
         "appointment_id": appointment.appointment_id,
         "appointment_date": appointment.appointment_date,
         "appointment_time": appointment.appointment_time,
@@ -163,5 +169,5 @@ def read_member_appointments(db: Session = Depends(get_db), current_user = Depen
             "street": address.street if address else "",
             "town": address.town if address else "",
         }
-    } for appointment in appointments]
+    } for appointment in appointments], response)
 
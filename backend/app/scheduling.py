@@ -0,0 +1,178 @@
+import threading
+from contextlib import ExitStack, contextmanager
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Appointments in these states no longer hold the caregiver's time.
+INACTIVE_STATUSES = ("declined", "cancelled")
+MAX_WORK_HOURS = 24
+# With work_hours capped at a day, only the previous day can spill over.
+LOOKBACK_DAYS = 1
+
+
+def appointment_interval(appointment_date: date, appointment_time, work_hours: int) -> Tuple[datetime, datetime]:
+    start = datetime.combine(appointment_date, appointment_time)
+    return start, start + timedelta(hours=work_hours)
+
+
+class IntervalIndex:
+    """Sorted intervals with a running maximum of end times.
+
+    ``overlapping`` bisects the starts to bound the candidates from above and
+    the running max of ends to bound them from below, then filters the
+    candidates in between: O(log n + m) for m candidates. m is the number of
+    overlaps unless an earlier, longer interval keeps the running max high,
+    in which case the intervals it covers are scanned too.
+
+    Building the index sorts its n intervals. find_conflicts builds one per
+    booking from the few days of appointments it reads, so the cost of a
+    check is bounded by that date window, not by the caregiver's history.
+    """
+
+    def __init__(self, intervals: List[Tuple[datetime, datetime, object]]):
+        self._intervals = sorted(intervals, key=lambda item: item[0])
+        self._starts = [start for start, _, _ in self._intervals]
+        self._max_ends = list(accumulate((end for _, end, _ in self._intervals), max))
+
+    def overlapping(self, start: datetime, end: datetime) -> list:
+        hi = bisect_left(self._starts, end)
+        lo = bisect_left(self._max_ends, start, hi=hi)
+        # max_ends is non-decreasing, so everything before lo ends at or before start.
+        while lo < hi and self._max_ends[lo] <= start:
+            lo += 1
+        return [item for s, e, item in self._intervals[lo:hi] if e > start]
+
+
+class _StripedLocks:
+    """Fixed pool of locks so bookings for one caregiver serialize in-process."""
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def __call__(self, key: int) -> threading.Lock:
+        return self._locks[hash(key) % len(self._locks)]
+
+    @contextmanager
+    def many(self, keys: Iterable[int]):
+        """Hold the stripes of several keys, taken in a fixed order to avoid deadlocks."""
+        with ExitStack() as stack:
+            for stripe in sorted({hash(key) % len(self._locks) for key in keys}):
+                stack.enter_context(self._locks[stripe])
+            yield
+
+
+caregiver_lock = _StripedLocks()
+
+
+def lock_caregiver(db: Session, caregiver_user_id: int) -> bool:
+    """Take a row lock on the caregiver (FOR UPDATE) so bookings serialize across workers.
+
+    Returns False if the caregiver does not exist.
+    """
+    caregiver = db.query(models.CAREGIVER.caregiver_user_id) \
+        .filter(models.CAREGIVER.caregiver_user_id == caregiver_user_id) \
+        .with_for_update() \
+        .first()
+    return caregiver is not None
+
+
+def lock_caregivers(db: Session, caregiver_user_ids: Sequence[int]):
+    """Row-lock several caregivers in one statement, in id order."""
+    if caregiver_user_ids:
+        db.query(models.CAREGIVER.caregiver_user_id) \
+            .filter(models.CAREGIVER.caregiver_user_id.in_(caregiver_user_ids)) \
+            .order_by(models.CAREGIVER.caregiver_user_id) \
+            .with_for_update() \
+            .all()
+
+
+def find_conflicts(db: Session, caregiver_user_id: int, appointment_date: date, appointment_time,
+                   work_hours: int, exclude_id: Optional[int] = None) -> List[models.APPOINTMENT]:
+    """Return the caregiver's active appointments overlapping the requested slot.
+
+    Only the days the slot can touch are read, through the
+    (caregiver_user_id, appointment_date) index.
+    """
+    start, end = appointment_interval(appointment_date, appointment_time, work_hours)
+    query = db.query(models.APPOINTMENT).filter(
+        models.APPOINTMENT.caregiver_user_id == caregiver_user_id,
+        models.APPOINTMENT.appointment_date >= appointment_date - timedelta(days=LOOKBACK_DAYS),
+        models.APPOINTMENT.appointment_date <= end.date(),
+        or_(models.APPOINTMENT.status.is_(None), models.APPOINTMENT.status.notin_(INACTIVE_STATUSES)),
+    )
+    if exclude_id is not None:
+        query = query.filter(models.APPOINTMENT.appointment_id != exclude_id)
+
+    intervals = []
+    for appointment in query:
+        if appointment.appointment_time is None or not appointment.work_hours:
+            continue
+        s, e = appointment_interval(appointment.appointment_date, appointment.appointment_time, appointment.work_hours)
+        intervals.append((s, e, appointment))
+    return IntervalIndex(intervals).overlapping(start, end)
+
+
+def busy_intervals(db: Session, caregiver_user_ids: Sequence[int], date_from: date,
+                   date_to: date) -> Dict[int, List[Tuple[datetime, datetime]]]:
+    """Active appointment intervals per caregiver, sorted by start, from one indexed query."""
+    rows = db.query(
+        models.APPOINTMENT.caregiver_user_id,
+        models.APPOINTMENT.appointment_date,
+        models.APPOINTMENT.appointment_time,
+        models.APPOINTMENT.work_hours,
+    ).filter(
+        models.APPOINTMENT.caregiver_user_id.in_(caregiver_user_ids),
+        models.APPOINTMENT.appointment_date >= date_from - timedelta(days=LOOKBACK_DAYS),
+        models.APPOINTMENT.appointment_date <= date_to,
+        models.APPOINTMENT.appointment_time.isnot(None),
+        models.APPOINTMENT.work_hours > 0,
+        or_(models.APPOINTMENT.status.is_(None), models.APPOINTMENT.status.notin_(INACTIVE_STATUSES)),
+    ).order_by(
+        models.APPOINTMENT.caregiver_user_id,
+        models.APPOINTMENT.appointment_date,
+        models.APPOINTMENT.appointment_time,
+    )
+    busy = {caregiver_user_id: [] for caregiver_user_id in caregiver_user_ids}
+    for caregiver_user_id, appointment_date, appointment_time, work_hours in rows:
+        busy[caregiver_user_id].append(appointment_interval(appointment_date, appointment_time, work_hours))
+    return busy
+
+
+def working_windows(date_from: date, date_to: date, day_start: time, day_end: time) -> List[Tuple[datetime, datetime]]:
+    days = (date_to - date_from).days + 1
+    return [
+        (datetime.combine(day, day_start), datetime.combine(day, day_end))
+        for day in (date_from + timedelta(days=offset) for offset in range(days))
+    ]
+
+
+def free_slots(busy: List[Tuple[datetime, datetime]], windows: Iterable[Tuple[datetime, datetime]],
+               duration: timedelta) -> List[Tuple[datetime, datetime]]:
+    """Sweep the sorted busy intervals once across the sorted working windows.
+
+    Returns the free gaps inside the windows that are at least ``duration`` long.
+    """
+    free = []
+    i = 0
+    for window_start, window_end in windows:
+        cursor = window_start
+        # Busy intervals that ended before this window can never matter again.
+        while i < len(busy) and busy[i][1] <= cursor:
+            i += 1
+        j = i
+        while j < len(busy) and busy[j][0] < window_end and cursor < window_end:
+            start, end = busy[j]
+            if start - cursor >= duration:
+                free.append((cursor, start))
+            cursor = max(cursor, end)
+            j += 1
+        if window_end - cursor >= duration:
+            free.append((cursor, window_end))
+    return free
@@ -1,6 +1,14 @@
-from pydantic import BaseModel, field_validator
-from typing import Optional, List
-from datetime import date, time
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Optional, List, Dict
+from datetime import date, datetime, time
+from enum import Enum
+
+
+def coordinates_together(model):
+    """Reject a latitude without a longitude and vice versa; geo.resolve needs both or neither."""
+    if (model.latitude is None) != (model.longitude is None):
+        raise ValueError('Set latitude and longitude together')
+    return model
 
 
 class UserBase(BaseModel):
@@ -64,8 +72,32 @@ class Caregiver(CaregiverBase):
     class Config:
         from_attributes = True
 
+class CaregiverPage(BaseModel):
+    items: List[Caregiver]
+    next_cursor: Optional[str] = None
+
+
+class RateBucket(BaseModel):
+    min_rate: float
+    max_rate: float
+    count: int
+
+
+class CaregiverSearchResult(BaseModel):
+    total: int
+    caregiver_user_ids: List[int]
+    facets: Dict[str, Dict[str, int]]
+    hourly_rate_histogram: List[RateBucket]
+
+
 class CaregiverUpdate(CaregiverBase):
     caregiver_user_id: int
+    city: Optional[str] = None
+    # A new city without coordinates is geocoded; see geo.resolve.
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    check_coordinates = model_validator(mode='after')(coordinates_together)
 
 
 class MemberBase(BaseModel):
@@ -88,6 +120,11 @@ class AddressBase(BaseModel):
     house_number: Optional[str] = None
     street: Optional[str] = None
     town: Optional[str] = None
+    # Geocoded from town when omitted.
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    check_coordinates = model_validator(mode='after')(coordinates_together)
 
 
 class AddressCreate(AddressBase):
@@ -116,11 +153,27 @@ class JobCreate(JobBase):
 class Job(JobBase):
     job_id: int
     member_user_id: int
+    date_posted: Optional[date] = None
 
     class Config:
         from_attributes = True
 
 
+class JobPage(BaseModel):
+    items: List[Job]
+    next_cursor: Optional[str] = None
+
+
+class CaregiverMatch(BaseModel):
+    caregiver_user_id: int
+    score: float
+
+
+class NearbyCaregiver(BaseModel):
+    caregiver_user_id: int
+    distance_km: float
+
+
 class JobApplicationBase(BaseModel):
     caregiver_user_id: int
     job_id: int
@@ -133,6 +186,16 @@ class JobApplicationOut(JobApplicationBase):
     date_applied: Optional[date] = None
 
 
+class BulkApplyRequest(BaseModel):
+    job_ids: List[int]
+
+
+class BulkApplyResult(BaseModel):
+    applied: List[JobApplicationOut]
+    already_applied: List[int]
+    not_found: List[int]
+
+
 class ApplicationsForJobOut(BaseModel):
     job: Job
     caregiver_user_id: int
@@ -154,6 +217,13 @@ class ApplicationsForJobOut(BaseModel):
 
 
 
+class AppointmentStatus(str, Enum):
+    pending = "pending"
+    accepted = "accepted"
+    declined = "declined"
+    cancelled = "cancelled"
+
+
 class AppointmentBase(BaseModel):
     appointment_date: Optional[date] = None
     appointment_time: Optional[time] = None
@@ -164,6 +234,10 @@ class AppointmentBase(BaseModel):
 class AppointmentCreate(AppointmentBase):
     caregiver_user_id: int
     member_user_id: int
+    status: Optional[AppointmentStatus] = None
+
+    class Config:
+        use_enum_values = True
 
 
 class AppointmentOut(AppointmentBase):
@@ -182,6 +256,28 @@ class AppointmentOut(AppointmentBase):
 
 
 
+class AppointmentStatusChange(BaseModel):
+    appointment_id: int
+    status: AppointmentStatus
+
+
+class AppointmentStatusResult(BaseModel):
+    appointment_id: int
+    status: AppointmentStatus
+    updated: bool
+    error: Optional[str] = None
+
+
+class TimeSlot(BaseModel):
+    start: datetime
+    end: datetime
+
+
+class CaregiverAvailability(BaseModel):
+    caregiver_user_id: int
+    slots: List[TimeSlot]
+
+
 class Appointment(AppointmentBase):
     appointment_id: int
     caregiver_user_id: int
@@ -209,6 +305,11 @@ class CaregiverRegister(BaseModel):
     gender: Optional[str] = None
     caregiving_type: Optional[str] = None
     hourly_rate: Optional[float] = None
+    # Geocoded from city when omitted.
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    check_coordinates = model_validator(mode='after')(coordinates_together)
 
 
 class MemberRegister(AddressBase):
@@ -224,8 +325,25 @@ class MemberRegister(AddressBase):
 
 
 
+class BulkImportRow(BaseModel):
+    row: int
+    email: Optional[str] = None
+    user_id: Optional[int] = None
+    error: Optional[str] = None
+
+
+class BulkImportResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkImportRow]
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
     user_type: str
-    user_id: int
\ No newline at end of file
+    user_id: int
+
+class EventTicket(BaseModel):
+    ticket: str
+    expires_in: int
@@ -0,0 +1,170 @@
+"""In-memory caregiver index behind ``GET /caregivers/search``.
+
+The index is one worker's copy; see indexing.py for how it is
+loaded and kept current.
+"""
+import math
+from bisect import bisect_left, bisect_right
+from typing import Dict, Optional, Set
+
+from .indexing import CaregiverIndex
+
+FACET_FIELDS = ("caregiving_type", "city", "gender")
+MAX_CACHED_BUCKET_WIDTHS = 4
+
+
+class CaregiverSearchIndex(CaregiverIndex):
+    """Per-process posting-list index over caregivers.
+
+    Categorical fields map each value to the set of caregiver ids holding it,
+    hourly rates are kept as a sorted list of (rate, id) pairs so a rate band
+    is two bisects and a slice. Histogram buckets are cached per bucket width.
+    """
+
+    def _reset(self):
+        self._postings: Dict[str, Dict[str, Set[int]]] = {field: {} for field in FACET_FIELDS}
+        self._docs: Dict[int, dict] = {}
+        self._rates = []
+        self._rate_ids = []
+        self._buckets: Dict[float, Dict[float, Set[int]]] = {}
+
+    def upsert(self, caregiver_user_id: int, **fields):
+        with self._lock:
+            if not self.loaded:
+                # Nothing to keep in sync yet; the first search builds from the DB.
+                return
+            doc = dict(self._docs.get(caregiver_user_id, {}))
+            doc.update({key: value for key, value in fields.items() if key in FACET_FIELDS or key == "hourly_rate"})
+            self._remove(caregiver_user_id)
+            self._add(caregiver_user_id, doc)
+
+    def remove(self, caregiver_user_id: int):
+        with self._lock:
+            self._remove(caregiver_user_id)
+
+    def _add(self, caregiver_user_id: int, doc: dict):
+        self._docs[caregiver_user_id] = doc
+        for field in FACET_FIELDS:
+            value = doc.get(field)
+            if value is not None:
+                self._postings[field].setdefault(value, set()).add(caregiver_user_id)
+        rate = doc.get("hourly_rate")
+        if rate is not None:
+            pos = bisect_left(self._rates, (rate, caregiver_user_id))
+            self._rates.insert(pos, (rate, caregiver_user_id))
+            self._rate_ids.insert(pos, caregiver_user_id)
+            for width, buckets in self._buckets.items():
+                buckets.setdefault(self._bucket_of(rate, width), set()).add(caregiver_user_id)
+
+    def _remove(self, caregiver_user_id: int):
+        doc = self._docs.pop(caregiver_user_id, None)
+        if doc is None:
+            return
+        for field in FACET_FIELDS:
+            value = doc.get(field)
+            if value is None:
+                continue
+            postings = self._postings[field].get(value)
+            if postings is not None:
+                postings.discard(caregiver_user_id)
+                if not postings:
+                    del self._postings[field][value]
+        rate = doc.get("hourly_rate")
+        if rate is not None:
+            pos = bisect_left(self._rates, (rate, caregiver_user_id))
+            if pos < len(self._rates) and self._rates[pos] == (rate, caregiver_user_id):
+                del self._rates[pos]
+                del self._rate_ids[pos]
+            for width, buckets in self._buckets.items():
+                members = buckets.get(self._bucket_of(rate, width))
+                if members is not None:
+                    members.discard(caregiver_user_id)
+                    if not members:
+                        del buckets[self._bucket_of(rate, width)]
+
+    def _rate_band(self, min_rate: Optional[float], max_rate: Optional[float]) -> Set[int]:
+        lo = 0 if min_rate is None else bisect_left(self._rates, (min_rate, -math.inf))
+        hi = len(self._rates) if max_rate is None else bisect_right(self._rates, (max_rate, math.inf))
+        return set(self._rate_ids[lo:hi])
+
+    @staticmethod
+    def _narrow(constraints: Dict[str, Set[int]], exclude: Optional[str] = None) -> Optional[Set[int]]:
+        """Intersect every constraint except ``exclude``; ``None`` means "all caregivers".
+
+        The result may be one of the posting sets itself and must not be mutated.
+        """
+        sets = sorted((ids for field, ids in constraints.items() if field != exclude), key=len)
+        if not sets:
+            return None
+        result = sets[0]
+        for other in sets[1:]:
+            result = result & other
+        return result
+
+    @staticmethod
+    def _bucket_of(rate: float, width: float) -> float:
+        return math.floor(rate / width) * width
+
+    def _histogram(self, base: Optional[Set[int]], bucket_width: float) -> Dict[float, int]:
+        buckets = self._buckets.get(bucket_width)
+        if buckets is None:
+            if len(self._buckets) >= MAX_CACHED_BUCKET_WIDTHS:
+                self._buckets.pop(next(iter(self._buckets)))
+            buckets = {}
+            for rate, caregiver_user_id in self._rates:
+                buckets.setdefault(self._bucket_of(rate, bucket_width), set()).add(caregiver_user_id)
+            self._buckets[bucket_width] = buckets
+
+        histogram = {}
+        for bucket, members in buckets.items():
+            count = len(members) if base is None else len(members & base)
+            if count:
+                histogram[bucket] = count
+        return histogram
+
+    def search(
+        self,
+        caregiving_type: Optional[str] = None,
+        city: Optional[str] = None,
+        gender: Optional[str] = None,
+        min_hourly_rate: Optional[float] = None,
+        max_hourly_rate: Optional[float] = None,
+        bucket_width: float = 5.0,
+    ) -> dict:
+        requested = {"caregiving_type": caregiving_type, "city": city, "gender": gender}
+
+        with self._lock:
+            constraints = {
+                field: self._postings[field].get(value, set())
+                for field, value in requested.items() if value is not None
+            }
+            if min_hourly_rate is not None or max_hourly_rate is not None:
+                constraints["hourly_rate"] = self._rate_band(min_hourly_rate, max_hourly_rate)
+            matches = self._narrow(constraints)
+            matches = self._docs.keys() if matches is None else matches
+
+            # Facet counts ignore the facet's own filter so the UI can show
+            # how many results each alternative value would produce.
+            facets = {}
+            for field in FACET_FIELDS:
+                base = self._narrow(constraints, exclude=field)
+                facets[field] = {}
+                for value, ids in self._postings[field].items():
+                    count = len(ids) if base is None else len(ids & base)
+                    if count:
+                        facets[field][value] = count
+
+            histogram = self._histogram(self._narrow(constraints, exclude="hourly_rate"), bucket_width)
+            caregiver_user_ids = sorted(matches)
+
+        return {
+            "caregiver_user_ids": caregiver_user_ids,
+            "facets": facets,
+            "hourly_rate_histogram": [
+                {"min_rate": bucket, "max_rate": bucket + bucket_width, "count": histogram[bucket]}
+                for bucket in sorted(histogram)
+            ],
+        }
+
+
+caregiver_index = CaregiverSearchIndex()
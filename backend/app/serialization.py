@@ -0,0 +1,43 @@
+from typing import Any, Optional
+
+import orjson
+from pydantic import TypeAdapter
+from starlette.responses import Response
+
+SKIPPED_HEADERS = {"content-length", "content-type"}
+
+
+class RenderedJSONResponse(Response):
+    """A JSON response whose body is already rendered to bytes by ResponseAdapter."""
+
+    media_type = "application/json"
+
+
+class ResponseAdapter:
+    """Precompiled serializer for hand-built response payloads.
+
+    Returning its response from a route bypasses FastAPI's own
+    ``response_model`` pass (validate, ``jsonable_encoder``, ``json.dumps``).
+    By default the payload is validated once by a cached ``TypeAdapter`` and
+    dumped straight to JSON by pydantic-core. With ``trusted=True`` validation
+    is skipped and the payload goes directly to orjson; only use that when
+    every value already has the type the schema promises.
+    """
+
+    def __init__(self, schema: Any, trusted: bool = False):
+        self.adapter = TypeAdapter(schema)
+        self.trusted = trusted
+
+    def render(self, data: Any) -> bytes:
+        if self.trusted:
+            return orjson.dumps(data)
+        return self.adapter.dump_json(self.adapter.validate_python(data))
+
+    def response(self, data: Any, response: Optional[Response] = None, status_code: int = 200) -> Response:
+        """Build the response, keeping headers that dependencies set on ``response``."""
+        result = RenderedJSONResponse(self.render(data), status_code=status_code)
+        if response is not None:
+            for key, value in response.headers.items():
+                if key not in SKIPPED_HEADERS:
+                    result.headers.append(key, value)
+        return result
@@ -0,0 +1,176 @@
+"""Stream table snapshots to NDJSON and load them back.
+
+Usage::
+
+    python -m app.snapshot export dumps/ --gzip
+    python -m app.snapshot import dumps/ --batch-size 5000
+
+One file per table (``<table>.ndjson`` or ``<table>.ndjson.gz``). Exports
+read through a server-side cursor, imports insert in batches in foreign-key
+order, so memory stays flat regardless of table size. Both use
+``DATABASE_URL`` unless ``--database-url`` is given.
+
+Only the data tables in ``DATA_TABLES`` are covered. ``schema_version`` and
+``resource_version`` belong to the target database (``python -m app.migrate
+upgrade`` stamps the first), and ``geocode`` is reference data loaded with
+``python -m app.geo load``.
+"""
+import argparse
+import datetime
+import gzip
+import json
+import os
+import sys
+import time
+
+from sqlalchemy import create_engine, insert, select, text
+from sqlalchemy.engine import Engine
+
+from . import models
+
+DEFAULT_BATCH_SIZE = 2000
+DATA_TABLES = frozenset(model.__tablename__ for model in (
+    models.USER, models.CAREGIVER, models.MEMBER, models.ADDRESS,
+    models.JOB, models.JOB_APPLICATION, models.APPOINTMENT,
+))
+
+
+def _tables(names=None):
+    tables = [table for table in models.Base.metadata.sorted_tables if table.name in DATA_TABLES]
+    if names:
+        unknown = set(names) - {table.name for table in tables}
+        if unknown:
+            raise SystemExit(f"Unknown tables: {', '.join(sorted(unknown))}")
+        tables = [table for table in tables if table.name in names]
+    return tables
+
+
+def _encode(value):
+    if isinstance(value, (datetime.date, datetime.time, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _decoders(table):
+    decoders = {}
+    for column in table.columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            continue
+        if python_type in (datetime.date, datetime.time, datetime.datetime):
+            decoders[column.name] = python_type.fromisoformat
+    return decoders
+
+
+def _path(directory, table, compress):
+    return os.path.join(directory, f"{table.name}.ndjson" + (".gz" if compress else ""))
+
+
+def _open(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _report(table, rows, started):
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed else float(rows)
+    print(f"{table.name}: {rows} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)", file=sys.stderr)
+
+
+def export_tables(engine: Engine, directory: str, compress: bool = False, names=None,
+                  batch_size: int = DEFAULT_BATCH_SIZE):
+    os.makedirs(directory, exist_ok=True)
+    for table in _tables(names):
+        started = time.perf_counter()
+        rows = 0
+        with engine.connect() as conn, _open(_path(directory, table, compress), "w") as out:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(
+                select(table).order_by(*table.primary_key.columns)
+            )
+            for row in result.mappings():
+                out.write(json.dumps(dict(row), default=_encode))
+                out.write("\n")
+                rows += 1
+        _report(table, rows, started)
+
+
+def reset_sequences(conn, table):
+    """Move Postgres serial sequences past the imported ids."""
+    if conn.dialect.name != "postgresql":
+        return
+    preparer = conn.dialect.identifier_preparer
+    quoted_table = preparer.format_table(table)
+    for column in table.primary_key.columns:
+        if column.autoincrement is not True:
+            continue
+        quoted_column = preparer.quote(column.name)
+        conn.execute(
+            text(
+                f"SELECT setval(pg_get_serial_sequence(:table, :column), "
+                f"COALESCE((SELECT MAX({quoted_column}) FROM {quoted_table}), 1), "
+                f"(SELECT MAX({quoted_column}) FROM {quoted_table}) IS NOT NULL)"
+            ),
+            {"table": quoted_table, "column": column.name},
+        )
+
+
+def import_tables(engine: Engine, directory: str, names=None, batch_size: int = DEFAULT_BATCH_SIZE):
+    for table in _tables(names):
+        path = next((p for p in (_path(directory, table, False), _path(directory, table, True))
+                     if os.path.exists(p)), None)
+        if path is None:
+            print(f"{table.name}: no dump found, skipped", file=sys.stderr)
+            continue
+
+        started = time.perf_counter()
+        rows = 0
+        decoders = _decoders(table)
+        statement = insert(table)
+        with engine.begin() as conn, _open(path, "r") as source:
+            batch = []
+            for line in source:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                for name, decode in decoders.items():
+                    if record.get(name) is not None:
+                        record[name] = decode(record[name])
+                batch.append(record)
+                if len(batch) == batch_size:
+                    conn.execute(statement, batch)
+                    rows += len(batch)
+                    batch = []
+            if batch:
+                conn.execute(statement, batch)
+                rows += len(batch)
+            reset_sequences(conn, table)
+        _report(table, rows, started)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export or import NDJSON table snapshots.")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--tables", nargs="+", help="limit to these data tables")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--gzip", action="store_true", help="compress exported files")
+    args = parser.parse_args(argv)
+
+    if not args.database_url:
+        parser.error("DATABASE_URL is not set and --database-url was not given")
+    engine = create_engine(args.database_url)
+    try:
+        if args.command == "export":
+            export_tables(engine, args.directory, compress=args.gzip, names=args.tables,
+                          batch_size=args.batch_size)
+        else:
+            import_tables(engine, args.directory, names=args.tables, batch_size=args.batch_size)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
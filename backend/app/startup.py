@@ -0,0 +1,142 @@
+"""Worker startup: schema check, optional warmup and an import-time report.
+
+The schema itself is managed by ``python -m app.migrate``; a worker only runs
+one SELECT to make sure the database is at the version it was built for.
+
+``SCHEMA_CHECK`` is ``strict`` (refuse to start on a mismatch), ``warn`` or
+``off``. With ``WARMUP=1`` the lifespan opens ``WARMUP_CONNECTIONS`` pooled
+connections per engine and builds the lazily created caches (OpenAPI schema,
+bcrypt backend, caregiver search and matching indexes) before the worker
+accepts traffic.
+
+Report which modules make ``app.main`` slow to import::
+
+    python -m app.startup --top 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import time
+from contextlib import AsyncExitStack, ExitStack, asynccontextmanager
+from pathlib import Path
+
+from . import auth, events, migrate
+from .database import POOL_SIZE, ReadSessionLocal, async_engine, async_replica_engines, engine, replica_engines
+from .matching import caregiver_features
+from .search_index import caregiver_index
+
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "strict").lower()
+WARMUP = os.getenv("WARMUP", "false").lower() in ("1", "true", "yes")
+WARMUP_CONNECTIONS = min(int(os.getenv("WARMUP_CONNECTIONS", "4")), POOL_SIZE)
+
+logger = logging.getLogger(__name__)
+
+
+def check_schema():
+    if SCHEMA_CHECK == "off":
+        return
+    try:
+        migrate.check(engine)
+    except migrate.SchemaMismatch:
+        if SCHEMA_CHECK == "strict":
+            raise
+        logger.warning("Schema check failed", exc_info=True)
+
+
+def _open_connections(target, count: int):
+    # Hold them all at once, otherwise the pool hands back the same connection.
+    with ExitStack() as stack:
+        for _ in range(count):
+            stack.enter_context(target.connect())
+
+
+async def _open_async_connections(target, count: int):
+    async with AsyncExitStack() as stack:
+        for _ in range(count):
+            await stack.enter_async_context(target.connect())
+
+
+def _load_indexes():
+    with ReadSessionLocal() as db:
+        caregiver_index.ensure_loaded(db)
+        caregiver_features.ensure_loaded(db)
+
+
+async def warm_up(app) -> dict:
+    """Run each warmup step and return how long it took, in seconds."""
+    steps = {
+        "connections": lambda: [_open_connections(target, WARMUP_CONNECTIONS)
+                                for target in [engine, *replica_engines.values()]],
+        "openapi": app.openapi,
+        "password_hashing": lambda: auth.pwd_context.handler("bcrypt").get_backend(),
+        "indexes": _load_indexes,
+    }
+    timings = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        await asyncio.to_thread(step)
+        timings[name] = time.perf_counter() - started
+    started = time.perf_counter()
+    for target in [async_engine, *async_replica_engines.values()]:
+        await _open_async_connections(target, WARMUP_CONNECTIONS)
+    timings["async_connections"] = time.perf_counter() - started
+    return timings
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await asyncio.to_thread(check_schema)
+    if WARMUP:
+        timings = await warm_up(app)
+        logger.info("Warmup done: %s", ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in timings.items()))
+    await events.broker.start()
+    try:
+        yield
+    finally:
+        await events.broker.stop()
+        for target in [async_engine, *async_replica_engines.values()]:
+            await target.dispose()
+        for target in [engine, *replica_engines.values()]:
+            target.dispose()
+
+
+def import_times(module: str = "app.main"):
+    """Import ``module`` in a fresh interpreter with ``-X importtime``.
+
+    Returns ``(name, self_us, cumulative_us)`` rows in import order.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=Path(__file__).resolve().parent.parent, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report import time of the API, slowest modules first.")
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args(argv)
+
+    rows = import_times(args.module)
+    total = next((cumulative for name, _, cumulative in rows if name == args.module), None)
+    if total is None:
+        parser.error(f"{args.module} did not appear in the import trace")
+    print(f"{args.module}: {total / 1000:.0f}ms total, {len(rows)} modules")
+    print(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda row: row[1], reverse=True)[:args.top]:
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
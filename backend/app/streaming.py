@@ -0,0 +1,65 @@
+from typing import AsyncIterator, Callable, Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.responses import Response, StreamingResponse
+
+STREAM_FORMATS = "^(ndjson|json)$"
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "json": "application/json"}
+DEFAULT_YIELD_PER = 500
+
+
+async def _rows(db: AsyncSession, statement: Select, schema: Type[BaseModel],
+                prepare: Optional[Callable] = None, yield_per: int = DEFAULT_YIELD_PER) -> AsyncIterator[str]:
+    # Request-scoped dependencies are closed only after the response has been
+    # sent, so the handler's session outlives the cursor.
+    result = await db.stream_scalars(statement.execution_options(yield_per=yield_per))
+    async for obj in result:
+        if prepare is not None:
+            prepare(obj)
+        yield schema.model_validate(obj).model_dump_json()
+
+
+async def _ndjson(rows: AsyncIterator[str], chunk_size: int) -> AsyncIterator[str]:
+    chunk = []
+    async for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+async def _json_array(rows: AsyncIterator[str], chunk_size: int) -> AsyncIterator[str]:
+    yield "["
+    separator = ""
+    chunk = []
+    async for row in rows:
+        chunk.append(separator + row)
+        separator = ","
+        if len(chunk) == chunk_size:
+            yield "".join(chunk)
+            chunk = []
+    chunk.append("]")
+    yield "".join(chunk)
+
+
+def stream_query(db: AsyncSession, statement: Select, schema: Type[BaseModel], fmt: str,
+                 prepare: Optional[Callable] = None, chunk_size: int = 100,
+                 response: Optional[Response] = None) -> StreamingResponse:
+    """Serialize query results incrementally as NDJSON or a chunked JSON array.
+
+    ``statement`` runs on the handler's own ``db``, so the rows come from the
+    same replica as any conditional-GET versions read for the request;
+    ``prepare`` may adjust each ORM object before validation. Headers set on
+    the handler's ``response`` (such as the ETag) are copied over, since
+    FastAPI does not merge them into a returned response.
+    """
+    rows = _rows(db, statement, schema, prepare)
+    body = _ndjson(rows, chunk_size) if fmt == "ndjson" else _json_array(rows, chunk_size)
+    headers = {} if response is None else {
+        key: value for key, value in response.headers.items() if key != "content-length"
+    }
+    return StreamingResponse(body, media_type=MEDIA_TYPES[fmt], headers=headers)
@@ -0,0 +1,161 @@
+"""Per-collection version counters backing ETag / Last-Modified on read endpoints.
+
+Write handlers call bump() inside their transaction; the counters are
+incremented in a short transaction of their own once that one commits and
+has released its connection. Holding the shared counter rows for a whole
+request would serialize every write to a collection, and handlers bumping
+several names could deadlock. A reader in the gap between the two commits
+gets the new data under the old tag, which only costs one extra full
+response after the bump. Read endpoints declare the collections they depend
+on with conditional(); a matching If-None-Match (or If-Modified-Since) is
+answered with 304 before the handler runs.
+
+The versions are read on the handler's own read session, before its body
+queries. A replica applies commits in order and the counters commit after
+the data, so the body is never older than the tag it is served with.
+"""
+import hashlib
+import logging
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from . import models, auth
+from .database import get_async_read_db, dialect_insert
+
+CAREGIVERS = "caregivers"
+MEMBERS = "members"
+JOBS = "jobs"
+JOB_APPLICATIONS = "job_applications"
+APPOINTMENTS = "appointments"
+
+
+PENDING_KEY = "pending_versions"
+COMMITTED_KEY = "committed_versions"
+
+logger = logging.getLogger(__name__)
+
+
+def bump(db: Session, *names: str):
+    """Increment the versions of ``names`` once ``db`` commits."""
+    db.info.setdefault(PENDING_KEY, set()).update(names)
+
+
+def _increment(db: Session, names):
+    now = datetime.utcnow()
+    table = models.RESOURCE_VERSION.__table__
+    statement = dialect_insert(db, table)
+    with db.get_bind().begin() as conn:
+        # Always in the same order, so concurrent bumps cannot deadlock.
+        for name in sorted(names):
+            conn.execute(statement.values(name=name, version=1, updated_at=now).on_conflict_do_update(
+                index_elements=[table.c.name],
+                set_={"version": table.c.version + 1, "updated_at": now},
+            ))
+
+
+@event.listens_for(Session, "after_commit")
+def _mark_committed(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    if pending:
+        session.info.setdefault(COMMITTED_KEY, set()).update(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _bump_committed(session, transaction):
+    # Only the outermost transaction has returned its connection at this point.
+    if transaction.parent is not None:
+        return
+    committed = session.info.pop(COMMITTED_KEY, None)
+    if committed:
+        try:
+            _increment(session, committed)
+        except Exception:
+            logger.exception("Could not bump versions of %s", ", ".join(sorted(committed)))
+
+
+def _version_of(name: str):
+    return select(models.RESOURCE_VERSION.version).where(models.RESOURCE_VERSION.name == name)
+
+
+def version_of(db: Session, name: str) -> int:
+    """Current version of ``name`` as seen by ``db``; 0 before its first bump."""
+    return db.scalar(_version_of(name)) or 0
+
+
+async def version_of_async(db: AsyncSession, name: str) -> int:
+    return (await db.scalar(_version_of(name))) or 0
+
+
+async def current_versions(db: AsyncSession, names):
+    rows = (await db.execute(
+        select(models.RESOURCE_VERSION.name, models.RESOURCE_VERSION.version, models.RESOURCE_VERSION.updated_at)
+        .where(models.RESOURCE_VERSION.name.in_(names))
+    )).all()
+    return {row.name: (row.version, row.updated_at) for row in rows}
+
+
+def _etag(versions: dict, names, scope: str) -> str:
+    parts = [f"{name}:{versions.get(name, (0, None))[0]}" for name in sorted(names)]
+    digest = hashlib.sha1("|".join(parts + [scope]).encode("utf-8")).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        candidates = {tag.strip() for tag in if_none_match.split(",")}
+        return "*" in candidates or etag in candidates or etag[2:] in candidates
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+async def _check(request: Request, response: Response, db: AsyncSession, names, user_id: Optional[int]):
+    versions = await current_versions(db, names)
+    scope = f"{request.url.path}?{request.url.query}|{user_id}"
+    etag = _etag(versions, names, scope)
+    stamps = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+    last_modified = max(stamps).replace(tzinfo=timezone.utc) if stamps else None
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    if _not_modified(request, etag, last_modified):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+
+def conditional(*names: str, per_user: bool = False):
+    """Dependency answering conditional GETs for data built from ``names``.
+
+    With ``per_user`` the tag is also scoped to the authenticated user.
+    The handler must take its session from ``get_async_read_db``: FastAPI
+    caches dependencies per request, so the versions and the body are read
+    through the same session and therefore the same replica.
+    """
+    if per_user:
+        async def dependency(request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db),
+                             principal: dict = Depends(auth.get_principal)):
+            await _check(request, response, db, names, principal["user"]["user_id"])
+    else:
+        async def dependency(request: Request, response: Response, db: AsyncSession = Depends(get_async_read_db)):
+            await _check(request, response, db, names, None)
+    return Depends(dependency)
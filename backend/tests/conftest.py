@@ -0,0 +1,85 @@
+"""Test setup.
+
+The app reads its settings when it is imported, so they are fixed here,
+before any test module imports it: every run gets a fresh SQLite database
+seeded with the benchmark population.
+"""
+import itertools
+import os
+import tempfile
+
+import pytest
+
+_DATABASE_DIR = tempfile.mkdtemp(prefix="app-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DATABASE_DIR, 'test.db')}"
+for _name in ("ASYNC_DATABASE_URL", "DATABASE_REPLICA_URLS", "EVENTS_BACKEND"):
+    os.environ.pop(_name, None)
+os.environ.setdefault("SECRET_KEY", "test-secret-key-that-is-long-enough-for-hs256")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ONBOARDING_API_KEY", "test-onboarding-key")
+os.environ.setdefault("REPORTS_API_KEY", "test-reports-key")
+# Cheap hashes keep registrations fast; still above the 4-round minimum so
+# tests can plant weaker hashes.
+os.environ.setdefault("BCRYPT_ROUNDS", "5")
+
+SEED_SCALE = 200
+
+
+@pytest.fixture(scope="session")
+def seeded():
+    """Population counts of the seeded database."""
+    from app.benchmark.seed import population, seed
+    from app.database import engine
+
+    counts = population(SEED_SCALE)
+    seed(engine, counts)
+    return counts
+
+
+@pytest.fixture(scope="module")
+def client(seeded):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    # Entering the client runs the lifespan, which disposes the engines on
+    # exit so the next module's event loop starts with fresh connections.
+    with TestClient(app) as client:
+        yield client
+
+
+_accounts = itertools.count()
+
+
+@pytest.fixture
+def register(client):
+    """Register a caregiver or member through the API and log it in."""
+    def register(role: str, **extra) -> dict:
+        email = f"test-{role}-{next(_accounts)}@test.local"
+        body = dict(email=email, given_name="Test", surname=role, city="Almaty", password="secret1",
+                    phone_number="+7 700 000 0000", **extra)
+        response = client.post(f"/{role}s", json=body)
+        assert response.status_code == 200, response.text
+        token = client.post("/token", json=dict(email=email, password="secret1")).json()
+        return {"user_id": token["user_id"], "email": email, "headers": {"Authorization": f"Bearer {token['access_token']}"}}
+    return register
+
+
+@pytest.fixture
+def caregiver(register):
+    return register("caregiver", caregiving_type="elderly")
+
+
+@pytest.fixture
+def member(register):
+    return register("member", town="Almaty", street="Abay", house_number="1")
+
+
+@pytest.fixture
+def book(client, caregiver, member):
+    def book(time: str, work_hours: int = 2, status: str = "pending", expected: int = 200):
+        response = client.post("/appointments", headers=member["headers"], json=dict(
+            caregiver_user_id=caregiver["user_id"], member_user_id=member["user_id"],
+            appointment_date="2030-03-04", appointment_time=time, work_hours=work_hours, status=status))
+        assert response.status_code == expected, response.text
+        return response.json()
+    return book
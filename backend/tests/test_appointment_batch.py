@@ -0,0 +1,51 @@
+def test_batch_status(client, member, book):
+    first = book("10:00:00")
+    second = book("14:00:00", status="cancelled")
+    response = client.put("/appointments/status", headers=member["headers"], json=[
+        dict(appointment_id=first["appointment_id"], status="cancelled"),
+        dict(appointment_id=second["appointment_id"], status="accepted"),
+        dict(appointment_id=0, status="accepted"),
+    ])
+    assert response.status_code == 200
+    assert [(r["appointment_id"], r["updated"], r["error"]) for r in response.json()] == [
+        (first["appointment_id"], True, None),
+        (second["appointment_id"], True, None),
+        (0, False, "Appointment not found"),
+    ]
+
+
+def test_batch_reactivation_conflicts_within_the_batch(client, member, book):
+    first = book("10:00:00", status="cancelled")
+    second = book("11:00:00", status="cancelled")
+    response = client.put("/appointments/status", headers=member["headers"], json=[
+        dict(appointment_id=first["appointment_id"], status="accepted"),
+        dict(appointment_id=second["appointment_id"], status="accepted"),
+    ])
+    assert [r["updated"] for r in response.json()] == [True, False]
+
+
+def test_batch_frees_slots_before_reactivating(client, member, book):
+    active = book("10:00:00")
+    cancelled = book("10:00:00", status="cancelled")
+    response = client.put("/appointments/status", headers=member["headers"], json=[
+        dict(appointment_id=active["appointment_id"], status="cancelled"),
+        dict(appointment_id=cancelled["appointment_id"], status="accepted"),
+    ])
+    assert [r["updated"] for r in response.json()] == [True, True]
+
+
+def test_batch_rejects_duplicate_ids(client, member, book):
+    appointment = book("10:00:00")
+    response = client.put("/appointments/status", headers=member["headers"], json=[
+        dict(appointment_id=appointment["appointment_id"], status="accepted"),
+        dict(appointment_id=appointment["appointment_id"], status="cancelled"),
+    ])
+    assert response.status_code == 422
+    assert response.json()["detail"]["appointment_ids"] == [appointment["appointment_id"]]
+
+
+def test_unknown_status_is_rejected(client, caregiver, member):
+    response = client.post("/appointments", headers=member["headers"], json=dict(
+        caregiver_user_id=caregiver["user_id"], member_user_id=member["user_id"],
+        appointment_date="2030-03-04", appointment_time="10:00:00", work_hours=2, status="maybe"))
+    assert response.status_code == 422
@@ -0,0 +1,33 @@
+def test_overlapping_booking_is_rejected(book):
+    first = book("10:00:00")
+    conflict = book("11:00:00", expected=409)
+    assert [a["appointment_id"] for a in conflict["detail"]["conflicts"]] == [first["appointment_id"]]
+
+
+def test_adjacent_bookings_are_allowed(book):
+    book("10:00:00")
+    book("12:00:00")
+    book("08:00:00")
+
+
+def test_inactive_bookings_do_not_hold_the_slot(book):
+    book("10:00:00", status="cancelled")
+    book("10:00:00")
+
+
+def test_reactivating_into_a_taken_slot_is_rejected(client, member, book):
+    cancelled = book("10:00:00")
+    client.put(f"/appointments/{cancelled['appointment_id']}/cancelled", headers=member["headers"])
+    book("10:00:00")
+
+    response = client.put(f"/appointments/{cancelled['appointment_id']}/accepted", headers=member["headers"])
+    assert response.status_code == 409
+    stored = client.get("/user/member_appointments", headers=member["headers"]).json()
+    assert {a["appointment_id"]: a["status"] for a in stored}[cancelled["appointment_id"]] == "cancelled"
+
+
+def test_reactivating_into_a_free_slot(client, member, book):
+    cancelled = book("10:00:00", status="cancelled")
+    response = client.put(f"/appointments/{cancelled['appointment_id']}/accepted", headers=member["headers"])
+    assert response.status_code == 200
+    assert response.json()["status"] == "accepted"
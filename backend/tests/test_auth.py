@@ -0,0 +1,52 @@
+from passlib.context import CryptContext
+from sqlalchemy import select, update
+
+from app import auth, models
+from app.database import SessionLocal
+
+
+def _register(client, email: str):
+    response = client.post("/caregivers", json=dict(email=email, given_name="Test", surname="Auth",
+                                                     password="secret1", caregiving_type="elderly"))
+    assert response.status_code == 200, response.text
+
+
+def _stored_hash(email: str) -> str:
+    with SessionLocal() as db:
+        return db.scalar(select(models.USER.password).where(models.USER.email == email))
+
+
+def _plant_weak_hash(email: str):
+    weak = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret1")
+    with SessionLocal() as db:
+        db.execute(update(models.USER).where(models.USER.email == email).values(password=weak))
+        db.commit()
+    return weak
+
+
+def test_new_hashes_use_the_configured_cost(client):
+    _register(client, "auth-cost@test.local")
+    assert auth.pwd_context.handler("bcrypt").from_string(_stored_hash("auth-cost@test.local")).rounds \
+        == auth.BCRYPT_ROUNDS
+
+
+def test_login_rehashes_below_the_minimum_cost(client, monkeypatch):
+    monkeypatch.setattr(auth, "PASSWORD_REHASH", True)
+    _register(client, "auth-rehash@test.local")
+    weak = _plant_weak_hash("auth-rehash@test.local")
+
+    response = client.post("/token", json=dict(email="auth-rehash@test.local", password="secret1"))
+    assert response.status_code == 200
+    stored = _stored_hash("auth-rehash@test.local")
+    assert stored != weak
+    assert auth.pwd_context.handler("bcrypt").from_string(stored).rounds == auth.BCRYPT_MIN_ROUNDS
+    assert client.post("/token", json=dict(email="auth-rehash@test.local", password="secret1")).status_code == 200
+
+
+def test_login_keeps_weak_hash_without_rehash(client, monkeypatch):
+    monkeypatch.setattr(auth, "PASSWORD_REHASH", False)
+    _register(client, "auth-keep@test.local")
+    weak = _plant_weak_hash("auth-keep@test.local")
+
+    assert client.post("/token", json=dict(email="auth-keep@test.local", password="secret1")).status_code == 200
+    assert _stored_hash("auth-keep@test.local") == weak
@@ -0,0 +1,48 @@
+from datetime import date, datetime, time, timedelta
+
+from app import scheduling
+
+
+def at(hour: int, day: int = 4) -> datetime:
+    return datetime(2030, 3, day, hour)
+
+
+def windows(days: int = 1):
+    return scheduling.working_windows(date(2030, 3, 4), date(2030, 3, 3 + days), time(8), time(20))
+
+
+def test_free_slots_without_bookings():
+    assert scheduling.free_slots([], windows(2), timedelta(hours=1)) == [(at(8), at(20)), (at(8, 5), at(20, 5))]
+
+
+def test_free_slots_between_bookings():
+    busy = [(at(9), at(10)), (at(10), at(12)), (at(15), at(16))]
+    assert scheduling.free_slots(busy, windows(), timedelta(hours=1)) == [
+        (at(8), at(9)), (at(12), at(15)), (at(16), at(20)),
+    ]
+
+
+def test_free_slots_skip_gaps_shorter_than_duration():
+    busy = [(at(9), at(10)), (at(11), at(19))]
+    assert scheduling.free_slots(busy, windows(), timedelta(hours=2)) == []
+
+
+def test_free_slots_with_overlapping_bookings():
+    busy = [(at(9), at(14)), (at(10), at(11)), (at(13), at(15))]
+    assert scheduling.free_slots(busy, windows(), timedelta(hours=1)) == [(at(8), at(9)), (at(15), at(20))]
+
+
+def test_free_slots_booking_spilling_into_next_day():
+    busy = [(at(19), at(9, 5))]
+    assert scheduling.free_slots(busy, windows(2), timedelta(hours=1)) == [(at(8), at(19)), (at(9, 5), at(20, 5))]
+
+
+def test_availability_excludes_booked_time(client, caregiver, member, book):
+    book("10:00:00")
+    response = client.get("/appointments/availability", headers=member["headers"], params=dict(
+        date_from="2030-03-04", date_to="2030-03-04", duration_hours=1, caregiver_user_id=caregiver["user_id"]))
+    assert response.status_code == 200
+    assert response.json() == [{"caregiver_user_id": caregiver["user_id"], "slots": [
+        {"start": "2030-03-04T08:00:00", "end": "2030-03-04T10:00:00"},
+        {"start": "2030-03-04T12:00:00", "end": "2030-03-04T20:00:00"},
+    ]}]
@@ -0,0 +1,36 @@
+import pytest
+
+from app.pagination import encode_cursor
+
+
+def test_pages_cover_the_list_exactly_once(client):
+    params = {"caregiving_type": "elderly"}
+    expected = [caregiver["caregiver_user_id"] for caregiver in client.get("/caregivers", params=params).json()]
+    assert expected
+
+    seen, cursor = [], None
+    while True:
+        page_params = {**params, "limit": 7}
+        if cursor:
+            page_params["cursor"] = cursor
+        page = client.get("/caregivers/page", params=page_params).json()
+        assert len(page["items"]) <= 7
+        seen += [caregiver["caregiver_user_id"] for caregiver in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == sorted(expected)
+
+
+def test_last_full_page_has_no_cursor(client):
+    everyone = client.get("/caregivers").json()
+    page = client.get("/caregivers/page", params={"limit": 1, "cursor": encode_cursor(
+        {"id": sorted(c["caregiver_user_id"] for c in everyone)[-2]})}).json()
+    assert len(page["items"]) == 1
+    assert page["next_cursor"] is None
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", encode_cursor({"id": "7"}), encode_cursor({})])
+def test_invalid_caregivers_cursor(client, cursor):
+    assert client.get("/caregivers/page", params={"cursor": cursor}).status_code == 400
@@ -0,0 +1,44 @@
+import time
+
+import pytest
+
+from app import auth, events
+from app.routers.events import TICKET_PURPOSE
+
+
+def short_ticket(user_id, seconds=0.5, purpose=TICKET_PURPOSE):
+    """A ticket whose session ends almost at once, so the stream closes by itself."""
+    return auth.create_ticket(purpose, user_id, time.time() + seconds)
+
+
+def test_ticket_endpoint_issues_a_redeemable_ticket(client, member):
+    response = client.post("/events/ticket", headers=member["headers"])
+    assert response.status_code == 200
+    body = response.json()
+    assert body["expires_in"] == auth.TICKET_TTL
+    assert auth.redeem_ticket(body["ticket"], TICKET_PURPOSE)[0] == member["user_id"]
+
+
+def test_ticket_opens_one_stream(client, member):
+    ticket = short_ticket(member["user_id"])
+    response = client.get("/events", params={"ticket": ticket})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text.startswith(events.RETRY_FRAME)
+
+    assert client.get("/events", params={"ticket": ticket}).status_code == 401
+
+
+@pytest.mark.parametrize("params", [{}, {"ticket": "garbage"}])
+def test_stream_requires_a_ticket_or_token(client, params):
+    response = client.get("/events", params=params)
+    assert response.status_code == 401
+
+
+def test_ticket_for_another_purpose_is_rejected(client, member):
+    response = client.get("/events", params={"ticket": short_ticket(member["user_id"], purpose="downloads")})
+    assert response.status_code == 401
+
+
+def test_ticket_cannot_be_created_without_a_token(client):
+    assert client.post("/events/ticket").status_code in (401, 403)
@@ -0,0 +1,56 @@
+import pytest
+
+# Far from the seeded population, and a degree apart per test, so only the
+# accounts a test creates are near its member.
+LONGITUDE = -120.0
+
+
+def member_at(register, latitude):
+    return register("member", town="Almaty", street="Abay", house_number="1", latitude=latitude, longitude=LONGITUDE)
+
+
+def nearby(client, member, **params):
+    response = client.get("/caregivers/nearby", headers=member["headers"], params=params)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_nearby_caregivers_nearest_first(client, register):
+    member = member_at(register, -60.0)
+    far = register("caregiver", latitude=-59.95, longitude=LONGITUDE)
+    near = register("caregiver", latitude=-59.99, longitude=LONGITUDE)
+
+    found = nearby(client, member, radius_km=10)
+    assert [c["caregiver_user_id"] for c in found] == [near["user_id"], far["user_id"]]
+    assert found[0]["distance_km"] == pytest.approx(1.11, abs=0.01)
+
+
+def test_relocated_caregiver_leaves_the_radius(client, register):
+    member = member_at(register, -62.0)
+    caregiver = register("caregiver", latitude=-62.0, longitude=LONGITUDE + 0.01)
+    assert [c["caregiver_user_id"] for c in nearby(client, member, radius_km=10)] == [caregiver["user_id"]]
+
+    response = client.put("/caregivers/my_caregiver_data", headers=caregiver["headers"], json=dict(
+        caregiver_user_id=caregiver["user_id"], latitude=-63.0, longitude=LONGITUDE))
+    assert response.status_code == 200, response.text
+    assert nearby(client, member, radius_km=10) == []
+
+
+@pytest.mark.parametrize("method, path, coordinates", [
+    ("put", "/members/my_address_data", {"latitude": 1.0}),
+    ("post", "/members/my_address_data", {"longitude": 1.0}),
+    ("put", "/caregivers/my_caregiver_data", {"latitude": 1.0}),
+])
+def test_half_coordinates_are_rejected(client, register, method, path, coordinates):
+    role = path.split("/")[1][:-1]
+    account = register(role, town="Almaty")
+    body = {f"{role}_user_id": account["user_id"], **coordinates}
+    response = client.request(method, path, headers=account["headers"], json=body)
+    assert response.status_code == 422
+    assert "Set latitude and longitude together" in response.text
+
+
+def test_half_coordinates_are_rejected_at_registration(client):
+    response = client.post("/caregivers", json=dict(email="half@test.local", given_name="T", surname="T",
+                                                     password="secret1", latitude=1.0))
+    assert response.status_code == 422
@@ -0,0 +1,35 @@
+from app import models, versioning
+from app.database import SessionLocal
+
+
+def _change_elsewhere(caregiver_user_id, **fields):
+    """Update a caregiver the way another worker would: the DB and the version, not this process's indexes."""
+    with SessionLocal() as db:
+        db.query(models.CAREGIVER).filter(models.CAREGIVER.caregiver_user_id == caregiver_user_id).update(fields)
+        versioning.bump(db, versioning.CAREGIVERS)
+        db.commit()
+
+
+def test_search_index_rebuilds_when_caregivers_version_changes(client):
+    before = client.get("/caregivers/search", params={"min_hourly_rate": 900}).json()
+    assert before["total"] == 0
+    caregiver_user_id = client.get("/caregivers/search", params={"limit": 1}).json()["caregiver_user_ids"][0]
+
+    _change_elsewhere(caregiver_user_id, hourly_rate=950)
+
+    after = client.get("/caregivers/search", params={"min_hourly_rate": 900}).json()
+    assert after["caregiver_user_ids"] == [caregiver_user_id]
+
+
+def test_matching_features_rebuild_when_caregivers_version_changes(client, register):
+    member = register("member", town="Almaty", street="Abay", house_number="1")
+    job = client.post("/jobs", headers=member["headers"], json=dict(
+        member_user_id=member["user_id"], required_caregiving_type="night nurse")).json()
+    url = f"/jobs/{job['job_id']}/recommended_caregivers"
+    caregiver_user_id = client.get(url, headers=member["headers"], params={"limit": 5}).json()[-1]["caregiver_user_id"]
+
+    # Nobody else offers the type, and the lowest rate adds the full rate weight.
+    _change_elsewhere(caregiver_user_id, caregiving_type="night nurse", hourly_rate=0)
+
+    best = client.get(url, headers=member["headers"], params={"limit": 1}).json()
+    assert best[0]["caregiver_user_id"] == caregiver_user_id
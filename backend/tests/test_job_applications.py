@@ -0,0 +1,43 @@
+import pytest
+
+from app import models
+from app.database import SessionLocal
+
+
+@pytest.fixture
+def jobs(client, member):
+    return [
+        client.post("/jobs", headers=member["headers"], json=dict(member_user_id=member["user_id"])).json()["job_id"]
+        for _ in range(3)
+    ]
+
+
+def apply(client, caregiver, job_id):
+    return client.post("/job_applications", headers=caregiver["headers"],
+                       json=dict(caregiver_user_id=caregiver["user_id"], job_id=job_id))
+
+
+def test_applying_twice_is_rejected_without_a_second_row(client, caregiver, jobs):
+    assert apply(client, caregiver, jobs[0]).status_code == 200
+    duplicate = apply(client, caregiver, jobs[0])
+    assert duplicate.status_code == 400
+    assert duplicate.json()["detail"] == "Application already exists"
+    with SessionLocal() as db:
+        assert db.query(models.JOB_APPLICATION).filter_by(caregiver_user_id=caregiver["user_id"]).count() == 1
+
+
+def test_applying_to_an_unknown_job(client, caregiver):
+    response = apply(client, caregiver, 0)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Job not found"
+
+
+def test_bulk_apply_sorts_out_new_existing_and_unknown_jobs(client, caregiver, jobs):
+    apply(client, caregiver, jobs[1])
+    response = client.post("/job_applications/bulk", headers=caregiver["headers"],
+                           json=dict(job_ids=[jobs[0], jobs[1], 0, jobs[2], jobs[0]]))
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert [application["job_id"] for application in result["applied"]] == [jobs[0], jobs[2]]
+    assert result["already_applied"] == [jobs[1]]
+    assert result["not_found"] == [0]
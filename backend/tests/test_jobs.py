@@ -0,0 +1,36 @@
+from app import models
+from app.database import SessionLocal
+
+
+def test_page_through_jobs_without_a_posting_date(client, register):
+    member = register("member", town="Almaty", street="Abay", house_number="1")
+    posted = [
+        client.post("/jobs", headers=member["headers"], json=dict(member_user_id=member["user_id"])).json()["job_id"]
+        for _ in range(4)
+    ]
+    undated = posted[1:3]
+    with SessionLocal() as db:
+        db.query(models.JOB).filter(models.JOB.job_id.in_(undated)).update({"date_posted": None})
+        db.commit()
+
+    seen, cursor = [], None
+    while True:
+        params = {"member_user_id": member["user_id"], "limit": 1}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/jobs/page", headers=member["headers"], params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        seen += [job["job_id"] for job in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    # Undated jobs first, then newest first; each job exactly once.
+    assert seen == sorted(undated, reverse=True) + sorted(set(posted) - set(undated), reverse=True)
+
+
+def test_invalid_jobs_cursor(client, register):
+    member = register("member", town="Almaty", street="Abay", house_number="1")
+    response = client.get("/jobs/page", headers=member["headers"], params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
@@ -0,0 +1,63 @@
+from app import auth, models, onboarding
+from app.database import SessionLocal
+
+HEADERS = {"X-Onboarding-Key": "test-onboarding-key"}
+CSV_HEADER = "email,given_name,surname,city,password,caregiving_type\n"
+
+
+def upload(client, body: bytes, role: str = "caregivers"):
+    return client.post(f"/onboarding/{role}", headers=HEADERS, files={"file": ("people.csv", body, "text/csv")})
+
+
+def emails_registered(*emails):
+    with SessionLocal() as db:
+        return {email for (email,) in db.query(models.USER.email).filter(models.USER.email.in_(emails))}
+
+
+def test_rows_are_reported_individually(client, register):
+    existing = register("caregiver")
+    body = (CSV_HEADER
+            + "onboard-ok@test.local,Ok,Row,Almaty,secret1,elderly\n"
+            + "onboard-nameless@test.local,,Nameless,Almaty,secret1,elderly\n"
+            + f"{existing['email']},Taken,Email,Almaty,secret1,elderly\n").encode()
+    response = upload(client, body)
+    assert response.status_code == 200, response.text
+    summary = response.json()
+    assert (summary["created"], summary["failed"]) == (1, 2)
+    assert [bool(result["error"]) for result in summary["results"]] == [False, True, True]
+    assert summary["results"][2]["error"] == "Email already registered"
+
+
+def test_non_utf8_upload_is_rejected_before_importing(client):
+    body = (CSV_HEADER + "onboard-before@test.local,Before,Bad,Almaty,secret1,elderly\n").encode() \
+        + "onboard-bad@test.local,José,Latin,Almaty,secret1,elderly\n".encode("latin-1")
+    response = upload(client, body)
+    assert response.status_code == 400
+    assert emails_registered("onboard-before@test.local") == set()
+
+
+def test_lost_race_falls_back_to_row_by_row_inserts(client, monkeypatch):
+    hash_passwords = auth.get_password_hashes
+
+    def hash_and_race(passwords):
+        # Another request registers the second email after the batch checked it was free.
+        with SessionLocal() as db:
+            db.add(models.USER(email="onboard-race-2@test.local", given_name="Raced", surname="Elsewhere",
+                               password="x"))
+            db.commit()
+        return hash_passwords(passwords)
+
+    monkeypatch.setattr(auth, "get_password_hashes", hash_and_race)
+    records = [dict(email=f"onboard-race-{i}@test.local", given_name="Race", surname=str(i), password="secret1")
+               for i in range(1, 4)]
+    with SessionLocal() as db:
+        results = onboarding.import_records(db, "caregivers", records)
+
+    assert [(result["email"], result["error"]) for result in results] == [
+        ("onboard-race-1@test.local", None),
+        ("onboard-race-2@test.local", "Email already registered"),
+        ("onboard-race-3@test.local", None),
+    ]
+    with SessionLocal() as db:
+        raced = db.query(models.USER).filter(models.USER.email == "onboard-race-2@test.local").one()
+        assert raced.caregiver is None
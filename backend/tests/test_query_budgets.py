@@ -0,0 +1,42 @@
+import asyncio
+
+from app import querybudget
+from app.benchmark import runner
+from app.database import QueryStats, track_queries
+
+
+def test_check_records_overrun():
+    stats = QueryStats()
+    stats.budget = 2
+    stats.count = 3
+    querybudget.check(stats, "GET", "/caregivers")
+    assert stats.over_budget == ["GET /caregivers ran 3 SQL statements, budget is 2"]
+
+
+def test_check_within_budget():
+    stats = QueryStats()
+    stats.budget = 2
+    stats.count = 2
+    querybudget.check(stats, "GET", "/caregivers")
+    assert stats.over_budget == []
+
+
+def test_nested_blocks_roll_up_overruns():
+    with track_queries() as outer:
+        with track_queries() as inner:
+            inner.budget = 0
+            inner.count = 1
+            querybudget.check(inner, "GET", "/jobs")
+    assert outer.over_budget == inner.over_budget
+
+
+def test_every_scenario_within_budget(seeded):
+    # Same settings as `python -m app.benchmark budgets`: one request at a
+    # time over two accounts, so the principal cache is cold for some requests.
+    results = asyncio.run(runner.run(3, 1, 2))
+    assert set(results) == set(runner.SCENARIOS)
+    over_budget = {name: result["over_budget"] for name, result in results.items() if "over_budget" in result}
+    assert over_budget == {}
+    server_errors = {name: result["status_codes"] for name, result in results.items()
+                     if any(int(code) >= 500 for code in result["status_codes"])}
+    assert server_errors == {}
@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from app import scheduling
+
+
+def at(hour: int, day: int = 4) -> datetime:
+    return datetime(2030, 3, day, hour)
+
+
+def test_interval_index_treats_touching_intervals_as_free():
+    index = scheduling.IntervalIndex([(at(10), at(12), "a"), (at(8), at(18), "b")])
+    assert index.overlapping(at(12), at(13)) == ["b"]
+    assert index.overlapping(at(18), at(19)) == []
+    assert sorted(index.overlapping(at(11), at(12))) == ["a", "b"]
@@ -0,0 +1,70 @@
+import pytest
+
+from app.database import AsyncReadSessionLocal, get_async_read_db
+from app.main import app
+
+
+@pytest.fixture
+def read_sessions():
+    created = []
+
+    async def counting_read_db():
+        async with AsyncReadSessionLocal() as db:
+            created.append(db)
+            yield db
+
+    app.dependency_overrides[get_async_read_db] = counting_read_db
+    yield created
+    app.dependency_overrides.pop(get_async_read_db, None)
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/caregivers", {}),
+    ("/caregivers", {"stream": "ndjson"}),
+    ("/caregivers/page", {}),
+    ("/members", {"stream": "json"}),
+])
+def test_versions_and_body_share_one_read_session(client, read_sessions, path, params):
+    # One session means one replica, so the ETag never describes newer data than the body.
+    response = client.get(path, params=params)
+    assert response.status_code == 200
+    assert response.headers["etag"]
+    assert len(read_sessions) == 1
+
+
+def test_unchanged_collection_answers_304(client):
+    first = client.get("/caregivers/page")
+    assert first.status_code == 200
+    again = client.get("/caregivers/page", headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+    assert again.content == b""
+    assert again.headers["etag"] == first.headers["etag"]
+
+
+def test_write_changes_the_tag(client, register):
+    caregiver = register("caregiver", caregiving_type="elderly")
+    first = client.get("/caregivers/page")
+
+    response = client.put("/caregivers/my_caregiver_data", headers=caregiver["headers"],
+                          json=dict(caregiver_user_id=caregiver["user_id"], hourly_rate=17))
+    assert response.status_code == 200, response.text
+
+    after = client.get("/caregivers/page", headers={"If-None-Match": first.headers["etag"]})
+    assert after.status_code == 200
+    assert after.headers["etag"] != first.headers["etag"]
+
+
+def test_if_modified_since(client, register):
+    register("caregiver")  # Last-Modified needs the collection to have been bumped once.
+    first = client.get("/caregivers/page")
+    since = {"If-Modified-Since": first.headers["last-modified"]}
+    assert client.get("/caregivers/page", headers=since).status_code == 304
+    assert client.get("/caregivers/page", headers={"If-Modified-Since": "Mon, 01 Jan 2001 00:00:00 GMT"}).status_code == 200
+
+
+def test_per_user_tags_differ_between_users(client, register):
+    first, second = register("member", town="Almaty"), register("member", town="Almaty")
+    tag = client.get("/jobs/page", headers=first["headers"]).headers["etag"]
+    response = client.get("/jobs/page", headers={**second["headers"], "If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != tag